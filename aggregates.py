@@ -0,0 +1,552 @@
+"""Pre-aggregated views of master_df used by the dashboard callbacks."""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+# The dimensions the dashboard filters or groups transfer fees by. Clubs are only ever
+# combined with years and leagues, so they get a cube of their own: together with ages,
+# positions and feet they would make nearly one cell per row on large datasets.
+CUBE_DIMENSIONS = ['transfer_year', 'league_name_to', 'position', 'foot', 'player_age']
+CLUB_CUBE_DIMENSIONS = ['transfer_year', 'league_name_to', 'club_name_to']
+
+# Dimensions with up to this many labels get one packed bitmap per label, the others
+# sorted cell positions per label (see BitmapIndex)
+DENSE_BITMAP_LABELS = 64
+
+
+class YearIndex:
+    """Row offsets of every year in an array sorted by year.
+
+    A year range then maps to a positional slice of the rows, which can be
+    taken with .iloc without building boolean masks or copying.
+    """
+
+    def __init__(self, years):
+        years = np.asarray(years)
+        if len(years) and (np.diff(years) < 0).any():
+            raise ValueError("YearIndex needs rows sorted by year")
+        self.first_year = int(years[0]) if len(years) else 0
+        last_year = int(years[-1]) if len(years) else -1
+        # offsets[i] is the first row whose year is >= first_year + i
+        self.offsets = np.searchsorted(years, np.arange(self.first_year, last_year + 2), side='left')
+
+    def slice(self, year_range):
+        """Return the slice of rows with year_range[0] <= year <= year_range[1], or of every row for None."""
+        last = len(self.offsets) - 1
+        if year_range is None:
+            return slice(0, self.offsets[last])
+        start = self.offsets[min(max(int(year_range[0]) - self.first_year, 0), last)]
+        stop = self.offsets[min(max(int(year_range[1]) + 1 - self.first_year, 0), last)]
+        return slice(start, max(start, stop))
+
+
+def window_bytes(start, stop):
+    """Return the slice of a packed bitmap's bytes holding bits start..stop-1."""
+    return slice(start // 8, (stop + 7) // 8)
+
+
+class BitmapIndex:
+    """Bitmaps of the cells holding each label of one dimension, to filter on lists of labels.
+
+    With few labels, each label (and missing values) has a packed bit array
+    over the cells, and a filter ORs those of the selected labels, or of the
+    others, inverted, when they are fewer. With many labels, most of them rare
+    (clubs), dense arrays would be nearly all zeros, so each label keeps the
+    sorted positions of its cells instead and a filter only reads the cells of
+    the labels it selects.
+
+    match() works on the bytes covering a range of cells, so a year range
+    (a contiguous block of cells) is resolved before any bit is read.
+    """
+
+    def __init__(self, codes, n_labels):
+        self.n_labels = n_labels
+        # Missing values (code -1) are label n_labels, and never selected
+        codes = np.where(codes < 0, n_labels, codes)
+        self.dense = n_labels <= DENSE_BITMAP_LABELS
+        if self.dense:
+            self.bitmaps = np.array([np.packbits(codes == code) for code in range(n_labels + 1)])
+        else:
+            # Postings sorted by (label, position), searchable under one int64 key
+            self.n_cells = len(codes)
+            self.positions = np.argsort(codes, kind='stable')
+            self._keys = codes[self.positions].astype(np.int64) * self.n_cells + self.positions
+
+    def match(self, codes, start, stop):
+        """Return the packed bits, over window_bytes(start, stop), of the cells whose label is in codes."""
+        window = window_bytes(start, stop)
+        selected = np.zeros(self.n_labels + 1, dtype=bool)
+        selected[np.asarray(codes, dtype=np.int64)] = True
+        invert = 2 * selected.sum() > self.n_labels + 1
+        wanted = np.flatnonzero(~selected if invert else selected)
+
+        if self.dense:
+            # An empty OR comes out as zeros
+            bits = np.bitwise_or.reduce(self.bitmaps[wanted, window], axis=0)
+        else:
+            # The postings of each wanted label within the window, gathered in one pass
+            first, last = window.start * 8, min(window.stop * 8, self.n_cells)
+            lo = np.searchsorted(self._keys, wanted * self.n_cells + first)
+            hi = np.searchsorted(self._keys, wanted * self.n_cells + last)
+            lengths = hi - lo
+            steps = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            found = np.zeros((window.stop - window.start) * 8, dtype=bool)
+            found[self.positions[np.repeat(lo, lengths) + steps] - first] = True
+            bits = np.packbits(found)
+        return ~bits if invert else bits
+
+
+class RangeBitmapIndex:
+    """Range-encoded bitmaps of an ordered dimension: bitmap k holds the cells with code <= k.
+
+    Any range of codes is then resolved from two bitmaps, (<= last) AND NOT
+    (<= first - 1), however wide the range. Missing values (code -1) are in
+    none of them.
+    """
+
+    def __init__(self, codes, n_labels):
+        below = np.zeros(len(codes), dtype=bool)
+        bitmaps = []
+        for code in range(n_labels):
+            below |= codes == code
+            bitmaps.append(np.packbits(below))
+        self.bitmaps = np.array(bitmaps).reshape(n_labels, (len(codes) + 7) // 8)
+
+    def between(self, first, last, start, stop):
+        """Return the packed bits, over window_bytes(start, stop), of the cells with first <= code <= last."""
+        window = window_bytes(start, stop)
+        if last < first:
+            return np.zeros(window.stop - window.start, dtype=np.uint8)
+        bits = self.bitmaps[last, window]
+        return bits & ~self.bitmaps[first - 1, window] if first > 0 else bits
+
+
+class FeeCube:
+    """Sum, count and max of transfer_fee for every combination of dimensions (CUBE_DIMENSIONS by default).
+
+    Each dimension is stored as integer codes into a sorted array of its
+    labels (-1 for missing values), so filters only touch the cells, never
+    the raw rows. Cells are sorted by year, and select() resolves the other
+    filters from bitmap indexes of the cells.
+    """
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS):
+        self.dimensions = list(dimensions)
+        self.labels = {}
+
+        keys = {}
+        for dim in self.dimensions:
+            codes, uniques = pd.factorize(df[dim], sort=True)
+            keys[dim] = codes
+            self.labels[dim] = np.asarray(uniques)
+        keys['transfer_fee'] = df['transfer_fee'].values
+
+        cells = pd.DataFrame(keys).groupby(self.dimensions, sort=True)['transfer_fee'].agg(['sum', 'count', 'max'])
+        self._set_cells(cells.reset_index().rename(columns={'sum': 'fee_sum', 'count': 'fee_count', 'max': 'fee_max'}))
+
+    def _set_cells(self, cells):
+        self.cells = cells
+        # Cells come out sorted by year code, i.e. by year (missing years, code -1, first)
+        self.year_index = YearIndex(np.append(self.labels['transfer_year'], -1)[self.cells['transfer_year'].values])
+
+        # Bitmap indexes for select(): per label of each listed dimension, and by range for ages
+        self.codes = {}
+        self.bitmaps = {}
+        for dim in self.dimensions:
+            if dim not in ('transfer_year', 'player_age'):
+                self.codes[dim] = {label: code for code, label in enumerate(self.labels[dim])}
+                self.bitmaps[dim] = BitmapIndex(cells[dim].values, len(self.labels[dim]))
+        if 'player_age' in self.dimensions:
+            self.age_bitmaps = RangeBitmapIndex(cells['player_age'].values, len(self.labels['player_age']))
+        self.paid_bitmap = np.packbits(cells['fee_max'].values > 0)
+
+    def appended(self, df):
+        """Return a new cube that also counts the rows of df, merging cells instead of regrouping every row."""
+        delta = FeeCube(df, self.dimensions)
+        cube = FeeCube.__new__(FeeCube)
+        cube.dimensions = self.dimensions
+        cube.labels = {}
+
+        old_cells, new_cells = self.cells.copy(), delta.cells.copy()
+        for dim in self.dimensions:
+            cube.labels[dim], old_map, new_map = merge_labels(self.labels[dim], delta.labels[dim])
+            old_cells[dim] = remap_codes(old_cells[dim].values, old_map)
+            new_cells[dim] = remap_codes(new_cells[dim].values, new_map)
+
+        cells = pd.concat([old_cells, new_cells], ignore_index=True).groupby(self.dimensions, sort=True)
+        cells = cells.agg({'fee_sum': 'sum', 'fee_count': 'sum', 'fee_max': 'max'}).reset_index()
+        cube._set_cells(cells)
+        return cube
+
+    @timed('filter', cells=True)
+    def select(self, years=None, ages=None, paid_only=False, **members):
+        """Return the cells inside the year/age ranges whose labels are in the given lists.
+
+        members maps a dimension name to the list of labels to keep, e.g.
+        select(years=(2014, 2024), league_name_to=['Laliga']). With
+        paid_only=True, cells without any transfer_fee > 0 are dropped.
+
+        The year range is a block of cells; within it each other filter is a
+        bitmap (labels ORed within a dimension) and the filters are ANDed.
+        """
+        rows = self.year_index.slice(years) if years is not None else slice(0, len(self.cells))
+        start, stop = rows.start, rows.stop
+
+        clauses = []
+        if ages is not None:
+            labels = self.labels['player_age']
+            first = np.searchsorted(labels, ages[0], side='left')
+            last = np.searchsorted(labels, ages[1], side='right') - 1
+            clauses.append(self.age_bitmaps.between(first, last, start, stop))
+        for dim, values in members.items():
+            codes = self.codes[dim]
+            clauses.append(self.bitmaps[dim].match([codes[v] for v in values or () if v in codes], start, stop))
+        if paid_only:
+            clauses.append(self.paid_bitmap[window_bytes(start, stop)])
+        if not clauses:
+            return self.cells.iloc[rows]
+
+        offset = start % 8
+        keep = np.unpackbits(functools.reduce(np.bitwise_and, clauses))[offset:offset + stop - start].view(bool)
+        return self.cells.iloc[rows] if keep.all() else self.cells.iloc[start + np.flatnonzero(keep)]
+
+    @timed('aggregate')
+    def aggregate(self, cells, by, how='sum'):
+        """Total (how='sum') or max (how='max') fee of the selected cells grouped by dimensions.
+
+        Returns a frame with one label column per dimension in `by` and the
+        aggregated 'transfer_fee', sorted by the labels. Cells with a missing
+        label in any of `by` are left out, like a groupby on the raw rows.
+        """
+        column = 'fee_sum' if how == 'sum' else 'fee_max'
+        cells = cells[(cells[by].values >= 0).all(axis=1)]
+        grouped = cells.groupby(by, sort=True)[column].agg(how).reset_index()
+        result = pd.DataFrame({dim: self.labels[dim][grouped[dim].values] for dim in by})
+        result['transfer_fee'] = grouped[column].values
+        return result
+
+
+class CountryFees:
+    """Total positive transfer fees per (year, country), precomputed once per dataset.
+
+    Every row's country_of_citizenship is normalised once (through name_map,
+    then the UK home nations override) to an index into country_names, so a
+    year range only sums a few rows of a small years x countries matrix.
+    """
+
+    UK_NATIONS = ["England", "Scotland", "Wales", "Northern Ireland"]
+
+    def __init__(self, df, country_names, name_map):
+        self.country_names = list(country_names)
+        self.name_map = name_map
+        self.first_year, self.sums = self._year_country_sums(df)
+
+    def _year_country_sums(self, df):
+        """Return (first year, matrix of positive fees per (year - first year, country)) of df's rows."""
+        position = {name: i for i, name in enumerate(self.country_names)}
+
+        # Normalise each distinct spelling once, then broadcast to the rows through the codes
+        codes, spellings = pd.factorize(df['country_of_citizenship'])
+        spelling_codes = []
+        for spelling in spellings:
+            country = self.name_map.get(spelling, spelling)
+            if country in self.UK_NATIONS:
+                country = "United Kingdom"
+            spelling_codes.append(position.get(country, -1))
+        country_codes = np.append(np.array(spelling_codes, dtype=np.int64), -1)[codes]
+
+        year_index = YearIndex(df['transfer_year'].values)
+        years = np.asarray(df['transfer_year'].values, dtype=np.int64) - year_index.first_year
+        fees = df['transfer_fee'].values
+        keep = (country_codes >= 0) & (fees > 0)
+
+        n_years = len(year_index.offsets) - 1
+        n_countries = len(self.country_names)
+        cells = years[keep] * n_countries + country_codes[keep]
+        sums = np.bincount(cells, weights=fees[keep], minlength=n_years * n_countries).reshape(n_years, n_countries)
+        return year_index.first_year, sums
+
+    def appended(self, df):
+        """Return new totals that also include the rows of df (which may add years on either side)."""
+        first_year, sums = self._year_country_sums(df)
+        merged = CountryFees.__new__(CountryFees)
+        merged.country_names = self.country_names
+        merged.name_map = self.name_map
+        merged.first_year = min(self.first_year, first_year)
+        n_years = max(self.first_year + len(self.sums), first_year + len(sums)) - merged.first_year
+        merged.sums = np.zeros((n_years, len(self.country_names)))
+        for start, block in [(self.first_year, self.sums), (first_year, sums)]:
+            offset = start - merged.first_year
+            merged.sums[offset:offset + len(block)] += block
+        return merged
+
+    @timed('aggregate')
+    def totals(self, year_range):
+        """Return the total fees per country (in country_names order) over the year range."""
+        first = max(int(year_range[0]) - self.first_year, 0)
+        last = min(int(year_range[1]) - self.first_year, len(self.sums) - 1)
+        if last < first:
+            return np.zeros(len(self.country_names))
+        return self.sums[first:last + 1].sum(axis=0)
+
+
+class FeeQuantiles:
+    """Mergeable sketches of the positive fees per (year, label of a column), for quantiles over any year range.
+
+    Each sketch is a histogram over fixed logarithmic buckets: bucket i holds
+    fees in (gamma^(i-1), gamma^i], with gamma = (1 + e) / (1 - e), and read
+    back as 2 gamma^i / (gamma + 1), which is within a relative error e of any
+    fee in it (as in DDSketch). The sketch of a year range is the sum of its
+    years' histograms, and as the buckets do not depend on the data, the
+    sketches of new rows are merged in by addition too.
+    """
+
+    # Largest fee with its own bucket; larger ones share the last
+    MAX_FEE = 1e11
+
+    def __init__(self, df, column, relative_error=0.01):
+        self.column = column
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.n_buckets = int(np.ceil(np.log(self.MAX_FEE) / np.log(self.gamma))) + 1
+        codes, labels = pd.factorize(df[column], sort=True)
+        self.labels = np.asarray(labels)
+        self.first_year, self.counts = self._histograms(df, codes, len(self.labels))
+
+    def _histograms(self, df, codes, n_labels):
+        """Return (first year, counts per (year - first year, label code, bucket)) of df's positive fees."""
+        year_index = YearIndex(df['transfer_year'].values)
+        years = np.asarray(df['transfer_year'].values, dtype=np.int64) - year_index.first_year
+        fees = df['transfer_fee'].values
+        keep = (codes >= 0) & (fees > 0)
+        buckets = np.clip(np.ceil(np.log(fees[keep]) / np.log(self.gamma)), 0, self.n_buckets - 1).astype(np.int64)
+
+        n_years = len(year_index.offsets) - 1
+        cells = (years[keep] * n_labels + codes[keep]) * self.n_buckets + buckets
+        counts = np.bincount(cells, minlength=n_years * n_labels * self.n_buckets)
+        return year_index.first_year, counts.reshape(n_years, n_labels, self.n_buckets)
+
+    def appended(self, df):
+        """Return new sketches that also include the rows of df (which may add years or labels)."""
+        codes, labels = pd.factorize(df[self.column], sort=True)
+        merged = FeeQuantiles.__new__(FeeQuantiles)
+        merged.column, merged.relative_error = self.column, self.relative_error
+        merged.gamma, merged.n_buckets = self.gamma, self.n_buckets
+        merged.labels, old_map, new_map = merge_labels(self.labels, np.asarray(labels))
+        first_year, counts = self._histograms(df, codes, len(labels))
+
+        merged.first_year = min(self.first_year, first_year)
+        n_years = max(self.first_year + len(self.counts), first_year + len(counts)) - merged.first_year
+        merged.counts = np.zeros((n_years, len(merged.labels), self.n_buckets), dtype=np.int64)
+        for start, block, mapping in [(self.first_year, self.counts, old_map), (first_year, counts, new_map)]:
+            offset = start - merged.first_year
+            merged.counts[offset:offset + len(block), mapping] += block
+        return merged
+
+    def _range(self, year_range):
+        first = max(int(year_range[0]) - self.first_year, 0)
+        last = min(int(year_range[1]) - self.first_year, len(self.counts) - 1)
+        if last < first:
+            return np.zeros((len(self.labels), self.n_buckets), dtype=np.int64)
+        return self.counts[first:last + 1].sum(axis=0)
+
+    def sizes(self, year_range):
+        """Return the number of positive fees per label (in labels order) over the year range."""
+        return self._range(year_range).sum(axis=1)
+
+    @timed('aggregate')
+    def quantiles(self, year_range, qs=(0.25, 0.5, 0.75, 0.9)):
+        """Return the labels with positive fees in the year range and their quantiles, as columns p25, p50...
+
+        Quantiles interpolate between the two closest ranks, as pandas does,
+        so p50 is the median of an even number of fees too.
+        """
+        sketch = self._range(year_range)
+        sizes = sketch.sum(axis=1)
+        present = np.flatnonzero(sizes)
+        cumulative = np.cumsum(sketch[present], axis=1)
+        result = pd.DataFrame({self.column: self.labels[present]})
+        for q in qs:
+            position = q * (sizes[present] - 1)
+            lower, upper = [
+                # Value of the bucket holding the fee of that (0-based) rank
+                2 * self.gamma ** (cumulative <= rank[:, None]).sum(axis=1) / (self.gamma + 1)
+                for rank in (np.floor(position), np.ceil(position))
+            ]
+            result[f"p{q * 100:g}"] = lower + (upper - lower) * (position - np.floor(position))
+        return result
+
+
+def club_fee_table(cube):
+    """Return a FeeCube's total fee per (year, league, club) as JSON-ready columns.
+
+    Leagues and clubs are codes into league_names and club_names (-1 for a
+    missing club). Rows without a league are left out, as no league filter
+    can select them.
+    """
+    cells = cube.cells
+    cells = cells[(cells['transfer_year'].values >= 0) & (cells['league_name_to'].values >= 0)]
+    table = cells.groupby(['transfer_year', 'league_name_to', 'club_name_to'], sort=True)['fee_sum'].sum().reset_index()
+    return {
+        'years': cube.labels['transfer_year'][table['transfer_year'].values].tolist(),
+        'leagues': table['league_name_to'].tolist(),
+        'clubs': table['club_name_to'].tolist(),
+        'fees': table['fee_sum'].tolist(),
+        'league_names': cube.labels['league_name_to'].tolist(),
+        'club_names': cube.labels['club_name_to'].tolist(),
+    }
+
+
+def foot_fee_table(df):
+    """Return how many times each positive fee occurs per (year, foot) as JSON-ready columns.
+
+    Much smaller than the rows themselves (fees are mostly round numbers),
+    yet exact medians over any year range can still be computed from it.
+    Feet are codes into foot_names, which is sorted.
+    """
+    paid = df[df['transfer_fee'].values > 0]
+    codes, feet = pd.factorize(paid['foot'], sort=True)
+    keep = codes >= 0
+    table = pd.DataFrame({
+        'transfer_year': paid['transfer_year'].values[keep],
+        'foot': codes[keep],
+        'fee': paid['transfer_fee'].values[keep],
+    }).groupby(['transfer_year', 'foot', 'fee'], sort=True).size().reset_index(name='count')
+    return {
+        'years': table['transfer_year'].tolist(),
+        'feet': table['foot'].tolist(),
+        'fees': table['fee'].tolist(),
+        'counts': table['count'].tolist(),
+        'foot_names': np.asarray(feet).tolist(),
+    }
+
+
+def merge_labels(labels, new_labels):
+    """Return (merged sorted labels, new code of each old label, new code of each new label)."""
+    merged = np.union1d(labels, new_labels)
+    return merged, np.searchsorted(merged, labels), np.searchsorted(merged, new_labels)
+
+
+def remap_codes(codes, mapping):
+    """Translate codes through mapping, keeping -1 (missing) as -1."""
+    return np.append(mapping, -1)[codes]
+
+
+def top_per_year(years, cumulative, tiebreak, top_n):
+    """Return (positions, ranks) of the top_n rows by cumulative fee within each year.
+
+    Positions come out ordered by year, then rank; ties go to the lower
+    tiebreak code, i.e. alphabetical order of the entity.
+    """
+    order = np.lexsort((tiebreak, -cumulative, years))
+    sorted_years = years[order]
+    # Rank = position within the block of rows sharing the year
+    ranks = np.arange(len(order)) - np.searchsorted(sorted_years, sorted_years, side='left') + 1
+    keep = ranks <= top_n
+    return order[keep], ranks[keep]
+
+
+@timed('aggregate')
+def race_frames(yearly, entity, top_n):
+    """Turn per-(year, entity) fees into the rows of a bar chart race.
+
+    yearly must be sorted by year, with 'transfer_year', the entity column
+    and 'transfer_fee' (as returned by FeeCube.aggregate). Adds the running
+    'cumulative_fee' per entity and keeps the top_n entities of each year
+    with their 'rank'.
+    """
+    if yearly.empty:
+        return yearly.assign(cumulative_fee=[], rank=[])
+    yearly = yearly.assign(cumulative_fee=yearly.groupby(entity, sort=False)['transfer_fee'].cumsum().values)
+    codes = pd.factorize(yearly[entity], sort=True)[0]
+    positions, ranks = top_per_year(yearly['transfer_year'].values, yearly['cumulative_fee'].values, codes, top_n)
+    race = yearly.iloc[positions].reset_index(drop=True)
+    race['rank'] = ranks
+    return race
+
+
+class CumulativeRace:
+    """Per-(year, entity) fees with each entity's running total, computed once per dataset.
+
+    A race over any year range is then a slice of these rows, with the
+    entity's total before the range subtracted, instead of a fresh
+    groupby/sort/cumsum over the raw rows.
+    """
+
+    def __init__(self, df, entity):
+        self.entity = entity
+        codes, labels = pd.factorize(df[entity], sort=True)
+        self.labels = np.asarray(labels)
+
+        keep = codes >= 0
+        self._set_yearly(df['transfer_year'].values[keep], codes[keep], df['transfer_fee'].values[keep])
+
+    def _set_yearly(self, years, codes, fees):
+        """Sum fees per (year, entity code) and build the running totals and lookup keys."""
+        yearly = pd.DataFrame({
+            'transfer_year': years,
+            'code': codes,
+            'fee': fees,
+        }).groupby(['transfer_year', 'code'], sort=True)['fee'].sum().reset_index()
+
+        self.years = yearly['transfer_year'].values
+        self.codes = yearly['code'].values
+        self.fees = yearly['fee'].values
+        # Running total of each entity since the first year of the dataset
+        self.totals = yearly.groupby('code', sort=False)['fee'].cumsum().values
+        self.year_index = YearIndex(self.years)
+
+        # The same rows ordered by (entity, year) under one int64 key, to look up
+        # an entity's running total as of any year with a binary search
+        self.first_year = self.year_index.first_year
+        self.year_span = len(self.year_index.offsets)
+        by_entity = np.lexsort((self.years, self.codes))
+        self._entity_codes = self.codes[by_entity]
+        self._entity_keys = self._key(self._entity_codes, self.years[by_entity])
+        self._entity_totals = self.totals[by_entity]
+
+    def appended(self, df):
+        """Return a new race that also includes the rows of df, regrouping the yearly sums rather than the rows."""
+        codes, labels = pd.factorize(df[self.entity], sort=True)
+        keep = codes >= 0
+        race = CumulativeRace.__new__(CumulativeRace)
+        race.entity = self.entity
+        race.labels, old_map, new_map = merge_labels(self.labels, np.asarray(labels))
+        race._set_yearly(
+            np.concatenate([self.years, df['transfer_year'].values[keep]]),
+            np.concatenate([old_map[self.codes], new_map[codes[keep]]]),
+            np.concatenate([self.fees, df['transfer_fee'].values[keep]])
+        )
+        return race
+
+    def _key(self, codes, years):
+        offset = np.clip(np.asarray(years, dtype=np.int64) - self.first_year, 0, self.year_span - 1)
+        return codes.astype(np.int64) * self.year_span + offset
+
+    def totals_before(self, codes, year):
+        """Return each entity's running total over the years before `year` (0 if none)."""
+        if year <= self.first_year:
+            return np.zeros(len(codes))
+        keys = self._key(codes, np.full(len(codes), year))
+        pos = np.searchsorted(self._entity_keys, keys, side='left') - 1
+        found = (pos >= 0) & (self._entity_codes[np.maximum(pos, 0)] == codes)
+        return np.where(found, self._entity_totals[np.maximum(pos, 0)], 0.0)
+
+    @timed('aggregate')
+    def frames(self, year_range, top_n):
+        """Return the top_n entities of each year in year_range by fees accumulated since its start."""
+        rows = self.year_index.slice(year_range)
+        years, codes = self.years[rows], self.codes[rows]
+        cumulative = self.totals[rows] - self.totals_before(codes, int(year_range[0]))
+
+        positions, ranks = top_per_year(years, cumulative, codes, top_n)
+        return pd.DataFrame({
+            'transfer_year': years[positions],
+            self.entity: self.labels[codes[positions]],
+            'year_fee': self.fees[rows][positions],
+            'cumulative_fee': cumulative[positions],
+            'rank': ranks,
+        })
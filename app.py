@@ -1,27 +1,125 @@
+import functools
+import os
+import threading
+
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, Output, Input
+from dash import html, dcc, ClientsideFunction, Output, Input, State
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import numpy as np
 import pandas as pd
 
-# Load your pre-processed master data
-master_df = pd.read_csv('master_cleaned_reduced.csv.gz', 
-                        parse_dates=['transfer_date', 'date_of_birth'], 
-                        compression='gzip')
+from aggregates import CLUB_CUBE_DIMENSIONS, CountryFees, CumulativeRace, FeeCube, FeeQuantiles, YearIndex, club_fee_table, foot_fee_table, race_frames
+from data_store import BASE_DIR, SHARED_DATASET, append_rows, dataset_version, load_master
+from fees import fee_scale, format_fees
+from export import install_export
+from figure_cache import FigureCache, shared_store_from_env, source_fingerprint
+from ingest import INGEST_DIR, DeltaWatcher, SwapLock
+from metrics import install_metrics, instrument, timed
+from payloads import compact_figures, install_payloads
+from request_guard import RequestGuard
+
+# Load your pre-processed master data (from the columnar snapshot when it is up to date),
+# with the list of delta files ingested into it since the CSV was built and the CSV's hash
+master_df, applied_deltas, source_hash = load_master()
+
+# master_df is sorted by year, so a year range is a contiguous block of rows
+year_index = YearIndex(master_df['transfer_year'].values)
+
+# Sum/count/max of fees per (year, league, position, foot, age) and per (year, league, club),
+# built once so callbacks don't rescan master_df
+fee_cube = FeeCube(master_df)
+club_cube = FeeCube(master_df, CLUB_CUBE_DIMENSIONS)
+
+# Yearly fees and running totals per player, so the players race is a slice rather than a regroup of every player
+players_race = CumulativeRace(master_df, 'player_name')
+
+# Log-bucket histograms of the positive fees per (year, foot), merged over the selected years
+# for the median fee by preferred foot (within 1%) once there are too many fees to sort exactly
+foot_quantiles = FeeQuantiles(master_df, 'foot')
+
+# LRU cache of the figures returned by the callbacks (FIGURE_CACHE_SIZE=0 disables it),
+# backed by a store shared between workers (see figure_cache.shared_store_from_env)
+figure_cache = FigureCache(
+    maxsize=int(os.environ.get('FIGURE_CACHE_SIZE', 256)),
+    version=f"{dataset_version(source_hash, applied_deltas)}-{source_fingerprint(BASE_DIR)}",
+    shared=shared_store_from_env(BASE_DIR)
+)
 
-master_df['transfer_year'] = master_df['transfer_date'].dt.year
-master_df['player_age'] = master_df['transfer_date'].dt.year - master_df['date_of_birth'].dt.year
+# Figure callbacks only compute the latest of the requests a browser has pending for them,
+# so a slider drag does not queue one computation per step on the worker
+request_guard = RequestGuard()
+
+# Callbacks read master_df and its aggregates as readers; swapping in newly ingested data waits for them
+dataset_lock = SwapLock()
+
+
+# Above SCATTER_WEBGL_ROWS transfers the fee-vs-age scatter is drawn with WebGL. Above
+# SCATTER_DENSITY_ROWS it becomes a server-side density heatmap, with only the
+# SCATTER_TOP_K most expensive transfers kept as individual points.
+SCATTER_WEBGL_ROWS = int(os.environ.get('SCATTER_WEBGL_ROWS', 1000))
+SCATTER_DENSITY_ROWS = int(os.environ.get('SCATTER_DENSITY_ROWS', 50000))
+SCATTER_TOP_K = int(os.environ.get('SCATTER_TOP_K', 500))
+SCATTER_FEE_BINS = 40
+
+# The Time Based figures all follow the year slider, so by default one callback builds
+# the four of them from a single filter pass. TIME_TAB_PROGRESSIVE=1 registers one
+# callback per figure instead, so each chart appears as soon as it is ready.
+TIME_TAB_PROGRESSIVE = os.environ.get('TIME_TAB_PROGRESSIVE') == '1'
+
+# With CLIENTSIDE_FILTERING=1 the club options, the clubs bar chart and the preferred foot
+# chart are computed in the browser (assets/clientside.js) from compact tables sent once
+# with the page, so those interactions never reach the server.
+CLIENTSIDE_FILTERING = os.environ.get('CLIENTSIDE_FILTERING') == '1'
+
+# Up to QUANTILE_EXACT_ROWS paid transfers in the selected years, the median fee by preferred
+# foot is computed exactly from the rows; above it, from the foot_quantiles sketches.
+QUANTILE_EXACT_ROWS = int(os.environ.get('QUANTILE_EXACT_ROWS', 100000))
+
+# Inputs every visitor starts from. The outputs for them are rendered once per dataset
+# version and injected into the layout (see render_tab_content).
+DEFAULT_FIRST_YEAR = 2014
+DEFAULT_AGE_RANGE = [18, 30]
+DEFAULT_POSITIONS = ['Attack', 'Midfield', 'Defender', 'Goalkeeper']
+DEFAULT_FEET = ['left', 'right', 'both', 'Unknown']
+
+
+@timed('filter', rows=True)
+def rows_in_years(year_range):
+    """Return the rows of master_df within the year range as a zero-copy positional slice."""
+    return master_df.iloc[year_index.slice(year_range)]
+
+
+def build_layout_statics():
+    """Return the slider bounds, marks and option lists of the tab layouts, for the current master_df."""
+    first_year, last_year = int(master_df['transfer_year'].min()), int(master_df['transfer_year'].max())
+    leagues = sorted(master_df['league_name_to'].dropna().unique())
+    return {
+        'first_year': first_year,
+        'last_year': last_year,
+        'year_marks': {str(year): str(year) for year in range(first_year, last_year + 1)},
+        'min_age': float(master_df['player_age'].min()),
+        'max_age': float(master_df['player_age'].max()),
+        'leagues': leagues,
+        'league_options': [{'label': x, 'value': x} for x in leagues],
+    }
+
+# Computed once per dataset version rather than on every tab render
+layout_statics = build_layout_statics()
+
+
+def default_years():
+    """Return the year range the year sliders start at."""
+    return [DEFAULT_FIRST_YEAR, layout_statics['last_year']]
+
+
+def default_leagues():
+    """Return the leagues selected when the Clubs tab opens."""
+    return layout_statics['leagues'][:3]
 
-master_df['transfer_fee_b'] = master_df['transfer_fee'] / 1e9
-master_df['transfer_fee_m'] = master_df['transfer_fee'] / 1e6
-master_df['transfer_fee_t'] = master_df['transfer_fee'] / 1e3
 
-# Standardize league names for the destination club by replacing hyphens and applying title case
-if 'league_name_to' in master_df.columns:
-    master_df['league_name_to'] = master_df['league_name_to'].str.replace('-', ' ').str.title()
-else:
-    print("Warning: 'league_name_to' column not found in master_df.")
-    
 # Full list of recognized country names for mapping and merging
 country_names = ['Bangladesh', 'Belgium', 'Burkina Faso', 'Bulgaria', 'Bosnia and Herzegovina', 'Barbados', 'Wallis and Futuna', 'Saint Barthelemy', 'Bermuda', 'Brunei', 'Bolivia', 'Bahrain', 'Burundi', 'Benin', 'Bhutan', 'Jamaica', 'Bouvet Island', 'Botswana', 'Samoa', 'Bonaire, Saint Eustatius and Saba', 'Brazil', 'Bahamas', 'Jersey', 'Belarus', 'Belize', 'Russia', 'Rwanda', 'Serbia', 'East Timor', 'Reunion', 'Turkmenistan', 'Tajikistan', 'Romania', 'Tokelau', 'Guinea-Bissau', 'Guam', 'Guatemala', 'South Georgia and the South Sandwich Islands', 'Greece', 'Equatorial Guinea', 'Guadeloupe', 'Japan', 'Guyana', 'Guernsey', 'French Guiana', 'Georgia', 'Grenada', 'United Kingdom', 'Gabon', 'El Salvador', 'Guinea', 'Gambia', 'Greenland', 'Gibraltar', 'Ghana', 'Oman', 'Tunisia', 'Jordan', 'Croatia', 'Haiti', 'Hungary', 'Hong Kong', 'Honduras', 'Heard Island and McDonald Islands', 'Venezuela', 'Puerto Rico', 'Palestinian Territory', 'Palau', 'Portugal', 'Svalbard and Jan Mayen', 'Paraguay', 'Iraq', 'Panama', 'French Polynesia', 'Papua New Guinea', 'Peru', 'Pakistan', 'Philippines', 'Pitcairn', 'Poland', 'Saint Pierre and Miquelon', 'Zambia', 'Western Sahara', 'Estonia', 'Egypt', 'South Africa', 'Ecuador', 'Italy', 'Vietnam', 'Solomon Islands', 'Ethiopia', 'Somalia', 'Zimbabwe', 'Saudi Arabia', 'Spain', 'Eritrea', 'Montenegro', 'Moldova', 'Madagascar', 'Saint Martin', 'Morocco', 'Monaco', 'Uzbekistan', 'Myanmar', 'Mali', 'Macao', 'Mongolia', 'Marshall Islands', 'Macedonia', 'Mauritius', 'Malta', 'Malawi', 'Maldives', 'Martinique', 'Northern Mariana Islands', 'Montserrat', 'Mauritania', 'Isle of Man', 'Uganda', 'Tanzania', 'Malaysia', 'Mexico', 'Israel', 'France', 'British Indian Ocean Territory', 'Saint Helena', 'Finland', 'Fiji', 'Falkland Islands', 'Micronesia', 'Faroe Islands', 'Nicaragua', 'Netherlands', 'Norway', 'Namibia', 'Vanuatu', 'New Caledonia', 'Niger', 'Norfolk Island', 'Nigeria', 'New Zealand', 'Nepal', 'Nauru', 'Niue', 'Cook Islands', 'Kosovo', 'Ivory Coast', 'Switzerland', 'Colombia', 'China', 'Cameroon', 'Chile', 'Cocos Islands', 'Canada', 'Republic of the Congo', 'Central African Republic', 'Democratic Republic of the Congo', 'Czech Republic', 'Cyprus', 'Christmas Island', 'Costa Rica', 'Curacao', 'Cape Verde', 'Cuba', 'Swaziland', 'Syria', 'Sint Maarten', 'Kyrgyzstan', 'Kenya', 'South Sudan', 'Suriname', 'Kiribati', 'Cambodia', 'Saint Kitts and Nevis', 'Comoros', 'Sao Tome and Principe', 'Slovakia', 'South Korea', 'Slovenia', 'North Korea', 'Kuwait', 'Senegal', 'San Marino', 'Sierra Leone', 'Seychelles', 'Kazakhstan', 'Cayman Islands', 'Singapore', 'Sweden', 'Sudan', 'Dominican Republic', 'Dominica', 'Djibouti', 'Denmark', 'British Virgin Islands', 'Germany', 'Yemen', 'Algeria', 'United States', 'Uruguay', 'Mayotte', 'United States Minor Outlying Islands', 'Lebanon', 'Saint Lucia', 'Laos', 'Tuvalu', 'Taiwan', 'Trinidad and Tobago', 'Turkey', 'Sri Lanka', 'Liechtenstein', 'Latvia', 'Tonga', 'Lithuania', 'Luxembourg', 'Liberia', 'Lesotho', 'Thailand', 'French Southern Territories', 'Togo', 'Chad', 'Turks and Caicos Islands', 'Libya', 'Vatican', 'Saint Vincent and the Grenadines', 'United Arab Emirates', 'Andorra', 'Antigua and Barbuda', 'Afghanistan', 'Anguilla', 'U.S. Virgin Islands', 'Iceland', 'Iran', 'Armenia', 'Albania', 'Angola', 'Antarctica', 'American Samoa', 'Argentina', 'Australia', 'Austria', 'Aruba', 'India', 'Aland Islands', 'Azerbaijan', 'Ireland', 'Indonesia', 'Ukraine', 'Qatar', 'Mozambique']
 
@@ -44,11 +142,56 @@ name_map = {
     "Palestine": "Palestinian Territory"
 }
 
+def build_clientside_tables():
+    """Return the aggregate tables and empty figures the clientside callbacks work from."""
+    # One-row frames, as px draws no trace at all for an empty one; the browser replaces the values
+    clubs_bar = px.bar(
+        pd.DataFrame({'transfer_year': [0], 'transfer_fee': [0.0]}),
+        x='transfer_year',
+        y='transfer_fee',
+        title='Total Transfer Fees per Year',
+        labels={'transfer_year': 'Year', 'transfer_fee': 'Fees'}
+    )
+    foot_bar = px.bar(
+        pd.DataFrame({'foot': [''], 'scaled_median': [0.0]}),
+        x='foot',
+        y='scaled_median',
+        title='Median Transfer Fee by Preferred Foot',
+        labels={'foot': 'Preferred Foot'}
+    )
+    return {
+        'clubs': club_fee_table(club_cube),
+        'feet': foot_fee_table(master_df),
+        'clubs_bar': clubs_bar.to_dict(),
+        'foot_bar': foot_bar.to_dict(),
+    }
+
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.config.suppress_callback_exceptions = True
-
-app.layout = dbc.Container(
-    [
+# Per-callback phase timings, filtered rows, response sizes and cache hits on /metrics, with DASH_METRICS=1
+install_metrics(app.server, figure_cache)
+# Default template sent once with the page, and brotli/gzip compressed callback responses;
+# after install_metrics, so the metrics see the compressed size
+install_payloads(app)
+
+@dataset_lock.reading
+def export_rows(year_range):
+    """Return the rows of master_df in the year range, or all of them for None, without copying."""
+    return master_df if year_range is None else rows_in_years(year_range)
+
+# Filtered rows streamed as CSV or Parquet on /export.csv and /export.parquet
+install_export(app.server, export_rows)
+
+TAB_IDS = ["tab-time", "tab-leagues", "tab-clubs", "tab-players"]
+
+def serve_layout():
+    """Page layout, built on every page load with the Time Based tab already rendered.
+
+    Every tab has its own container. A tab is rendered the first time it is
+    opened and then stays mounted, hidden while another tab is active, so
+    switching back keeps its inputs and figures without any request.
+    """
+    children = [
         dbc.Tabs(
             [
                 dbc.Tab(label="Time Based", tab_id="tab-time"),
@@ -60,16 +203,63 @@ app.layout = dbc.Container(
             active_tab="tab-time",
             className="mb-3"  # margin bottom for spacing
         ),
-        html.Div(id="tab-content")
-    ],
-    fluid=True  # ensures the container scales nicely on all devices
+        # Tabs opened in this page so far, and the one to render next (see showTab in assets/clientside.js)
+        dcc.Store(id='rendered-tabs', data=["tab-time"]),
+        dcc.Store(id='tab-request'),
+    ] + [
+        html.Div(
+            render_tab_content(tab_id) if tab_id == "tab-time" else None,
+            id=f"{tab_id}-content",
+            style=None if tab_id == "tab-time" else {'display': 'none'}
+        )
+        for tab_id in TAB_IDS
+    ]
+    if CLIENTSIDE_FILTERING:
+        # Sent once with the page and read as State by the clientside callbacks
+        children.append(dcc.Store(id='clientside-tables', data=clientside_tables))
+    return dbc.Container(children, fluid=True)  # fluid ensures the container scales nicely on all devices
+
+app.layout = serve_layout
+
+clientside_tables = build_clientside_tables() if CLIENTSIDE_FILTERING else None
+
+# Component tree of each tab, with its default figures, built once per dataset version on
+# first use or by warm_tab_layouts; replaced by a new dict whenever the dataset changes
+tab_layouts = {}
+# One lock per tab, so two requests never build the same tab while the others stay free
+tab_layout_locks = {tab_id: threading.Lock() for tab_id in TAB_IDS}
+
+# Showing a tab only toggles styles in the browser; the server is asked for a tab's
+# layout the first time it is opened
+app.clientside_callback(
+    ClientsideFunction(namespace='transfers', function_name='showTab'),
+    [Output(f"{tab_id}-content", "style") for tab_id in TAB_IDS]
+    + [Output('tab-request', 'data'), Output('rendered-tabs', 'data')],
+    Input("tabs", "active_tab"),
+    State('rendered-tabs', 'data'),
+    prevent_initial_call=True
 )
 
+# Tabs come with their default figures, so no callback needs to run until the user changes an input
 @app.callback(
-    Output("tab-content", "children"),
-    Input("tabs", "active_tab")
+    [Output(f"{tab_id}-content", "children") for tab_id in TAB_IDS],
+    Input('tab-request', 'data'),
+    prevent_initial_call=True
 )
+def render_requested_tab(requested_tab):
+    return [render_tab_content(tab_id) if tab_id == requested_tab else dash.no_update for tab_id in TAB_IDS]
+
 def render_tab_content(active_tab):
+    """Return the layout of a tab, built once per dataset version."""
+    # A layout built while the dataset is swapped goes into the old version's dict
+    layouts = tab_layouts
+    with tab_layout_locks[active_tab]:
+        if active_tab not in layouts:
+            layouts[active_tab] = build_tab_layout(active_tab, build_default_outputs(active_tab))
+    return layouts[active_tab]
+
+@dataset_lock.reading
+def build_tab_layout(active_tab, default_outputs):
     if active_tab == "tab-time":
         return dbc.Container([
                 html.H4("Time Based Analysis"),
@@ -79,10 +269,10 @@ def render_tab_content(active_tab):
                 # Year Range Slider at the top
                 dcc.RangeSlider(
                     id='year-slider',
-                    min=master_df['transfer_year'].min(),
-                    max=master_df['transfer_year'].max(),
-                    value=[2014, master_df['transfer_year'].max()],
-                    marks={str(year): str(year) for year in range(master_df['transfer_year'].min(), master_df['transfer_year'].max()+1)},
+                    min=layout_statics['first_year'],
+                    max=layout_statics['last_year'],
+                    value=default_years(),
+                    marks=layout_statics['year_marks'],
                     step=1
                 ),
 
@@ -93,7 +283,7 @@ def render_tab_content(active_tab):
                     dbc.Col(
                         dbc.Card(
                             dbc.CardBody(
-                                dcc.Graph(id='graph-max-fee')
+                                dcc.Graph(id='graph-max-fee', figure=default_outputs.get('graph-max-fee'))
                             ),
                             className="mb-3"
                         ),
@@ -102,7 +292,7 @@ def render_tab_content(active_tab):
                     dbc.Col(
                         dbc.Card(
                             dbc.CardBody(
-                                dcc.Graph(id='top5-league-line')
+                                dcc.Graph(id='top5-league-line', figure=default_outputs.get('top5-league-line'))
                             ),
                             className="mb-3"
                         ),
@@ -115,7 +305,7 @@ def render_tab_content(active_tab):
                     dbc.Col(
                         dbc.Card(
                             dbc.CardBody(
-                                dcc.Graph(id='transfer-fee-vs-age')
+                                dcc.Graph(id='transfer-fee-vs-age', figure=default_outputs.get('transfer-fee-vs-age'))
                             ),
                             className="mb-3"
                         ),
@@ -128,7 +318,7 @@ def render_tab_content(active_tab):
                     dbc.Col(
                         dbc.Card(
                             dbc.CardBody(
-                                dcc.Graph(id='transfer-fee-choropleth')
+                                dcc.Graph(id='transfer-fee-choropleth', figure=default_outputs.get('transfer-fee-choropleth'))
                             ),
                             className="mb-3"
                         ),
@@ -147,9 +337,9 @@ def render_tab_content(active_tab):
             html.Label("Age Range"),
             dcc.RangeSlider(
                 id='age-range-slider',
-                min=master_df['player_age'].min(),
-                max=master_df['player_age'].max(),
-                value=[18, 30],
+                min=layout_statics['min_age'],
+                max=layout_statics['max_age'],
+                value=DEFAULT_AGE_RANGE,
                 marks={str(a): str(a) for a in range(15, 41, 2)},  # Adjust this if necessary
                 step=1
             ),
@@ -159,12 +349,12 @@ def render_tab_content(active_tab):
             dcc.Checklist(
                 id='position-checklist',
                 options=[
-                    {'label': 'Attacker', 'value': 'Attacker'},
-                    {'label': 'Midfielder', 'value': 'Midfielder'},
+                    {'label': 'Attacker', 'value': 'Attack'},
+                    {'label': 'Midfielder', 'value': 'Midfield'},
                     {'label': 'Defender', 'value': 'Defender'},
                     {'label': 'Goalkeeper', 'value': 'Goalkeeper'}
                 ],
-                value=['Attacker', 'Midfielder', 'Defender', 'Goalkeeper']  # default all selected
+                value=DEFAULT_POSITIONS  # default all selected
             ),
 
             # Preferred foot dropdown
@@ -177,7 +367,7 @@ def render_tab_content(active_tab):
                     {'label': 'Both', 'value': 'both'},
                     {'label': 'Unknown', 'value': 'Unknown'}
                 ],
-                value=['left', 'right', 'both', 'Unknown'],  # default all
+                value=DEFAULT_FEET,  # default all
                 multi=True
             ),
 
@@ -186,7 +376,7 @@ def render_tab_content(active_tab):
             # Static Bar Chart
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='league-total-fees-bar')
+                    dcc.Graph(id='league-total-fees-bar', figure=default_outputs.get('league-total-fees-bar'))
                 ),
                 className="mb-3"
             ),
@@ -196,7 +386,7 @@ def render_tab_content(active_tab):
             # Animated Race Chart
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='leagues-race')
+                    dcc.Graph(id='leagues-race', figure=default_outputs.get('leagues-race'))
                 ),
                 className="mb-3"
             )
@@ -211,10 +401,10 @@ def render_tab_content(active_tab):
             html.Label("Year Range"),
             dcc.RangeSlider(
                 id='clubs-year-slider',
-                min=master_df['transfer_year'].min(),
-                max=master_df['transfer_year'].max(),
-                value=[2014, master_df['transfer_year'].max()],
-                marks={str(y): str(y) for y in range(master_df['transfer_year'].min(), master_df['transfer_year'].max()+1)},
+                min=layout_statics['first_year'],
+                max=layout_statics['last_year'],
+                value=default_years(),
+                marks=layout_statics['year_marks'],
                 step=1
             ),
 
@@ -224,8 +414,8 @@ def render_tab_content(active_tab):
             html.Label("Select League(s)"),
             dcc.Dropdown(
                 id='league-dropdown',
-                options=[{'label': x, 'value': x} for x in sorted(master_df['league_name_to'].dropna().unique())],
-                value=sorted(master_df['league_name_to'].dropna().unique())[:3],  # default selection (first three, for example)
+                options=layout_statics['league_options'],
+                value=default_leagues(),  # default selection (first three, for example)
                 multi=True,
                 placeholder="Select one or more leagues..."
             ),
@@ -236,7 +426,7 @@ def render_tab_content(active_tab):
             # Race Chart (Animated)
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='clubs-race')
+                    dcc.Graph(id='clubs-race', figure=default_outputs.get('clubs-race'))
                 ),
                 className="mb-3"
             ),
@@ -247,6 +437,7 @@ def render_tab_content(active_tab):
             html.Label("Select Club"),
             dcc.Dropdown(
                 id='club-dropdown',
+                options=default_outputs.get('club-dropdown'),
                 multi=True,
                 placeholder="Pick one or more clubs..."
             ),
@@ -255,7 +446,7 @@ def render_tab_content(active_tab):
             
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='clubs-bar')
+                    dcc.Graph(id='clubs-bar', figure=default_outputs.get('clubs-bar'))
                 ),
                 className="mb-3"
             )
@@ -269,17 +460,17 @@ def render_tab_content(active_tab):
             html.Label("Year Range for Players Race Chart"),
             dcc.RangeSlider(
                 id='players-year-slider',
-                min=master_df['transfer_year'].min(),
-                max=master_df['transfer_year'].max(),
-                value=[2014, master_df['transfer_year'].max()],
-                marks={str(year): str(year) for year in range(master_df['transfer_year'].min(), master_df['transfer_year'].max()+1)},
+                min=layout_statics['first_year'],
+                max=layout_statics['last_year'],
+                value=default_years(),
+                marks=layout_statics['year_marks'],
                 step=1
             ),
             html.Br(),
             
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='players-race')
+                    dcc.Graph(id='players-race', figure=default_outputs.get('players-race'))
                 ),
                 className="mb-3"
             ),
@@ -294,7 +485,7 @@ def render_tab_content(active_tab):
             
             dbc.Card(
                 dbc.CardBody(
-                    dcc.Graph(id='players-foot-bar')
+                    dcc.Graph(id='players-foot-bar', figure=default_outputs.get('players-foot-bar'))
                 ),
                 className="mb-3"
             )
@@ -303,36 +494,20 @@ def render_tab_content(active_tab):
     return "No tab selected"
 
 # Max Transfer Fee per Year Bar Chart
-@app.callback(
-    Output('graph-max-fee', 'figure'),
-    Input('year-slider', 'value')
-)
-def update_max_fee_bar(year_range):
-    # Filter
-    filtered = master_df[
-        (master_df['transfer_year'] >= year_range[0]) &
-        (master_df['transfer_year'] <= year_range[1])
-    ]
-
+def max_fee_bar_figure(cells, year_range):
+    """Build the max fee bar chart from the fee cube cells of the selected years."""
     # 2. Aggregate raw fees (max)
-    max_fee_year = filtered.groupby('transfer_year')['transfer_fee'].max().reset_index(name='raw_fee')
+    max_fee_year = fee_cube.aggregate(cells, ['transfer_year'], 'max').rename(columns={'transfer_fee': 'raw_fee'})
 
     # 3. Decide on a single scale for the entire chart based on the maximum bar
     overall_max = max_fee_year['raw_fee'].max()
-    scale_col, scale_suffix = pick_scale_column(overall_max)
-
-    # If scale_col == 'transfer_fee_b', we divide by 1e9; if 'transfer_fee_m', we divide by 1e6, etc.
-    if scale_col == 'transfer_fee_b':
-        max_fee_year['scaled_fee'] = max_fee_year['raw_fee'] / 1e9
-    elif scale_col == 'transfer_fee_m':
-        max_fee_year['scaled_fee'] = max_fee_year['raw_fee'] / 1e6
-    elif scale_col == 'transfer_fee_t':
-        max_fee_year['scaled_fee'] = max_fee_year['raw_fee'] / 1e3
-    else:
-        max_fee_year['scaled_fee'] = max_fee_year['raw_fee']
+    scale, scale_suffix = fee_scale(overall_max)
+
+    # scale is 1e9 for billions, 1e6 for millions, etc.
+    max_fee_year['scaled_fee'] = max_fee_year['raw_fee'] / scale
 
     # 4. Format each bar's fee individually for hover
-    max_fee_year['formatted_fee'] = max_fee_year['raw_fee'].apply(format_fee)
+    max_fee_year['formatted_fee'] = format_fees(max_fee_year['raw_fee'].values)
 
     # 5. Build the bar chart using scaled_fee as the y-axis
     fig = px.bar(
@@ -355,41 +530,34 @@ def update_max_fee_bar(year_range):
 
     return fig
 
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
+def update_max_fee_bar(year_range):
+    # 1. Filter the fee cube
+    return max_fee_bar_figure(fee_cube.select(years=year_range), year_range)
+
 # Top 5 Spending Leagues Every Year
-@app.callback(
-    Output('top5-league-line', 'figure'),
-    Input('year-slider', 'value')
-)
-def update_top5_league_line(year_range):
-    # Filter
-    filtered = master_df[
-        (master_df['transfer_year'] >= year_range[0]) &
-        (master_df['transfer_year'] <= year_range[1])
-    ]
-    
+def top5_league_line_figure(cells):
+    """Build the top 5 leagues line chart from the fee cube cells of the selected years."""
     # Sum raw fees by league/year
-    league_year = filtered.groupby(['transfer_year','league_name_to'])['transfer_fee'].sum().reset_index(name='raw_fee')
+    league_year = fee_cube.aggregate(cells, ['transfer_year', 'league_name_to']).rename(columns={'transfer_fee': 'raw_fee'})
     
     # Possibly pick top 5 leagues
-    top5 = league_year.groupby('league_name_to')['raw_fee'].sum().nlargest(5).index
+    top5 = league_year.groupby('league_name_to', observed=True)['raw_fee'].sum().nlargest(5).index
     league_year = league_year[league_year['league_name_to'].isin(top5)]
     
     # Determine overall max to pick scale
     overall_max = league_year['raw_fee'].max()
-    scale_col, scale_suffix = pick_scale_column(overall_max)
+    scale, scale_suffix = fee_scale(overall_max)
     
     # Create scaled_fee
-    if scale_col == 'transfer_fee_b':
-        league_year['scaled_fee'] = league_year['raw_fee'] / 1e9
-    elif scale_col == 'transfer_fee_m':
-        league_year['scaled_fee'] = league_year['raw_fee'] / 1e6
-    elif scale_col == 'transfer_fee_t':
-        league_year['scaled_fee'] = league_year['raw_fee'] / 1e3
-    else:
-        league_year['scaled_fee'] = league_year['raw_fee']
+    league_year['scaled_fee'] = league_year['raw_fee'] / scale
     
     # Format each row’s raw fee
-    league_year['formatted_fee'] = league_year['raw_fee'].apply(format_fee)
+    league_year['formatted_fee'] = format_fees(league_year['raw_fee'].values)
 
     fig = px.line(
         league_year,
@@ -412,43 +580,46 @@ def update_top5_league_line(year_range):
 
     return fig
 
-# Transfer Fee vs Age over Time
-@app.callback(
-    Output('transfer-fee-vs-age', 'figure'),
-    Input('year-slider', 'value')
-)
-def update_scatter_age(year_range):
-    # Filter data for the selected range
-    filtered = master_df[
-        (master_df['transfer_year'] >= year_range[0]) &
-        (master_df['transfer_year'] <= year_range[1])
-    ].copy()
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
+def update_top5_league_line(year_range):
+    # Filter the fee cube
+    return top5_league_line_figure(fee_cube.select(years=year_range))
 
+# Transfer Fee vs Age over Time
+def scatter_age_figure(filtered):
+    """Build the fee vs age scatter from the master_df rows of the selected years."""
     # Decide on a scale based on overall maximum fee in the filtered data
     overall_max = filtered['transfer_fee'].max()
-    scale_col, scale_suffix = pick_scale_column(overall_max)
+    scale, scale_suffix = fee_scale(overall_max)
 
-    # Create scaled_fee
-    if scale_col == 'transfer_fee_b':
-        filtered['scaled_fee'] = filtered['transfer_fee'] / 1e9
-    elif scale_col == 'transfer_fee_m':
-        filtered['scaled_fee'] = filtered['transfer_fee'] / 1e6
-    elif scale_col == 'transfer_fee_t':
-        filtered['scaled_fee'] = filtered['transfer_fee'] / 1e3
+    # Too many transfers to send one by one: bin them instead and only plot the most expensive
+    density = len(filtered) > SCATTER_DENSITY_ROWS
+    if density:
+        points = filtered.nlargest(SCATTER_TOP_K, 'transfer_fee')
+        title = f"Transfer Fees vs. Age {scale_suffix} ({len(filtered):,} transfers, top {len(points)} shown individually)"
     else:
-        filtered['scaled_fee'] = filtered['transfer_fee']
+        points = filtered.copy()
+        title = f"Transfer Fees vs. Age {scale_suffix}"
+
+    # Create scaled_fee
+    points['scaled_fee'] = points['transfer_fee'] / scale
 
     # Format each point’s raw fee
-    filtered['formatted_fee'] = filtered['transfer_fee'].apply(format_fee)
+    points['formatted_fee'] = format_fees(points['transfer_fee'].values)
 
     fig = px.scatter(
-        filtered,
+        points,
         x='player_age',
         y='scaled_fee',
         color='transfer_year',
-        title=f"Transfer Fees vs. Age {scale_suffix}",
+        title=title,
         labels={'scaled_fee': f"Fees {scale_suffix}", 'transfer_year': 'Year', 'player_age': 'Age'},
-        custom_data=['player_name', 'formatted_fee', 'club_name_from', 'club_name_to', 'position']
+        custom_data=['player_name', 'formatted_fee', 'club_name_from', 'club_name_to', 'position'],
+        render_mode='webgl' if len(points) > SCATTER_WEBGL_ROWS else 'svg'
     )
 
      # 4. Customize hovertemplate to display these fields
@@ -463,64 +634,99 @@ def update_scatter_age(year_range):
             "Year: %{marker.color}<extra></extra>"
         )
     )
+
+    # 5. Draw the density of all transfers underneath the individual points
+    if density:
+        heatmap = fee_age_heatmap(filtered, scale)
+        if heatmap is not None:
+            fig.add_trace(heatmap)
+            fig.data = fig.data[-1:] + fig.data[:-1]
+            # The fee buckets are log-spaced; the lowest row holds the free transfers
+            fig.update_yaxes(type='log', title_text=f"Fees {scale_suffix} (log scale, lowest row: free)")
     
     return fig
 
-# Total Transfer Fees by Country
-@app.callback(
-    Output('transfer-fee-choropleth', 'figure'),
-    Input('year-slider', 'value')
-)
-def update_choropleth(year_range):
-    # 1. Filter data within the selected year range and only transfers > 0
-    filtered = master_df[
-        (master_df['transfer_year'] >= year_range[0]) &
-        (master_df['transfer_year'] <= year_range[1]) &
-        (master_df['transfer_fee'] > 0)
-    ].copy()
-
-     # 2. Map country names
-    filtered['country_plotly'] = filtered['country_of_citizenship'].replace(name_map)
-    filtered.loc[
-        filtered['country_plotly'].isin(["England", "Scotland", "Wales", "Northern Ireland"]), 
-        'country_plotly'
-    ] = "United Kingdom"
-    
-    # 3. Group by raw fees for the tooltip, rename transfer_fee to raw_fee
-    grouped = filtered.groupby('country_plotly')['transfer_fee'].sum().reset_index().rename(columns={'transfer_fee': 'raw_fee'})
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
+def update_scatter_age(year_range):
+    # Filter data for the selected range
+    return scatter_age_figure(rows_in_years(year_range))
+
+def fee_age_heatmap(transfers, scale, fee_bins=SCATTER_FEE_BINS):
+    """Return a heatmap trace of the number of transfers per (age, fee bucket), or None if empty."""
+    ages = transfers['player_age'].values.astype(float)
+    fees = transfers['transfer_fee'].values / scale
+    known = ~np.isnan(ages) & ~np.isnan(fees)
+    ages, fees = ages[known], fees[known]
+    if len(ages) == 0:
+        return None
+
+    # One bin per whole year of age. Fees are heavy-tailed, so fee_bins log-spaced buckets
+    # span the paid fees (drawn on a log axis), under one extra bucket of the free transfers
+    age_edges = np.arange(np.floor(ages.min()), np.floor(ages.max()) + 2) - 0.5
+    paid = fees[fees > 0]
+    low, high = (paid.min(), paid.max()) if len(paid) else (1.0, 10.0)
+    paid_edges = np.geomspace(low, max(high, low * 10), fee_bins + 1)
+    fee_edges = np.concatenate([[low * low / paid_edges[1]], paid_edges])
+    free_fee = np.sqrt(fee_edges[0] * fee_edges[1])
+    counts, _, _ = np.histogram2d(ages, np.where(fees > 0, fees, free_fee), bins=[age_edges, fee_edges])
+    counts = counts.T  # rows are fee buckets, columns are ages
+
+    lows, highs = format_fees(fee_edges[:-1] * scale), format_fees(fee_edges[1:] * scale)
+    bucket_labels = lows + ' - ' + highs
+    bucket_labels[0] = 'Free'
+    customdata = np.dstack([counts.astype(int).astype(str), np.broadcast_to(bucket_labels[:, None], counts.shape)])
+
+    return go.Heatmap(
+        x=age_edges[:-1] + 0.5,
+        # One more y than rows of z: plotly takes them as the bucket edges
+        y=fee_edges,
+        # log scale so the few expensive buckets are not washed out by the many free transfers
+        z=np.where(counts > 0, np.log10(np.maximum(counts, 1)), np.nan),
+        customdata=customdata,
+        colorscale='Greys',
+        showscale=False,
+        hovertemplate="Age: %{x}<br>Fee: %{customdata[1]}<br>Transfers: %{customdata[0]}<extra></extra>"
+    )
 
-    grouped['fee_m'] = grouped['raw_fee'] / 1e6  # store millions for the color scale
+# Positive fees per (year, country) with the country names already normalised
+country_fees = CountryFees(master_df, country_names, name_map)
 
-    # 4. Merge with all countries
-    all_countries = pd.DataFrame({'country_plotly': country_names})
-    merged_countries = all_countries.merge(grouped, on='country_plotly', how='left')
-    merged_countries[['raw_fee','fee_m']] = merged_countries[['raw_fee','fee_m']].fillna(0)
+@functools.lru_cache(maxsize=None)
+def choropleth_template():
+    """Build the country choropleth once, on first use, with zero fees, as a plain figure dict.
 
-    # 5. Create a formatted fee using format_fee function
-    merged_countries['fee_str'] = merged_countries['raw_fee'].apply(format_fee)
+    Requests only swap in their values vector, colour range and hover strings.
+    Building it is left out of the import, where it was the first figure built
+    and paid plotly's half-second first-figure setup.
+    """
+    countries = pd.DataFrame({'country_plotly': country_names, 'fee_m': 0.0, 'fee_str': ''})
 
-    # 6. Define color scale (0 -> grey, positive -> range of blues)
+    # 1. Define color scale (0 -> grey, positive -> range of blues)
     custom_colorscale = [
         [0.0, '#f0f0f0'],   # Zero fee -> grey
         [0.00001, 'lightblue'],
         [1.0, 'blue']
     ]
 
-    # 7. Build the choropleth
+    # 2. Build the choropleth
     fig = px.choropleth(
-        merged_countries,
+        countries,
         locations='country_plotly',
         locationmode='country names',
         color='fee_m',
         title='Total Transfer Fees by Country (M)',
         color_continuous_scale=custom_colorscale,
-        range_color=(0, merged_countries['fee_m'].max() if merged_countries['fee_m'].max() > 0 else 1),
+        range_color=(0, 1),
         labels={'fee_m': 'Fees (M)', 'country_plotly': 'Country'},
         hover_name='country_plotly',
         custom_data=['country_plotly', 'fee_str']
     )
 
-    # 8. Geo styling
+    # 3. Geo styling
     fig.update_geos(
         scope='world',
         showcountries=True,
@@ -529,7 +735,7 @@ def update_choropleth(year_range):
         oceancolor="#dfe9f3"
     )
 
-    # 9. Annotation
+    # 4. Annotation
     fig.add_annotation(
         x=0.5, y=-0.1,
         xref='paper', yref='paper',
@@ -538,7 +744,7 @@ def update_choropleth(year_range):
         xanchor='center'
     )
 
-    # 10. Custom hovertemplate
+    # 5. Custom hovertemplate
     fig.update_traces(
         hovertemplate=(
             "%{customdata[0]}<br>"
@@ -547,70 +753,96 @@ def update_choropleth(year_range):
         )
     )
 
-    return fig
+    return fig.to_dict()
 
-def pick_scale_column(max_fee):
-    """Return which scale (billions, millions, thousands, or raw) to use 
-       based on the maximum fee in the dataset."""
-    if max_fee == 0:
-        return 'transfer_fee', ''   
-    if max_fee >= 1e9:
-        return 'transfer_fee_b', '(B)'
-    elif max_fee >= 1e6:
-        return 'transfer_fee_m', '(M)'
-    elif max_fee >= 1e3:
-        return 'transfer_fee_t', '(K)'
-    else:
-        return 'transfer_fee', ''
+# Total Transfer Fees by Country
+def choropleth_figure(raw_fee):
+    """Build the country choropleth from the total fee of every country in country_names."""
+    fee_m = raw_fee / 1e6  # store millions for the color scale
 
-def format_fee(value):
-    """Return a string with the appropriate suffix (B, M, K) for the given fee."""
-    try:
-        fee = float(value)
-    except (ValueError, TypeError):
-        return "N/A"
-    
-    if fee >= 1e9:
-        return f"{fee/1e9:.2f}B"
-    elif fee >= 1e6:
-        return f"{fee/1e6:.2f}M"
-    elif fee >= 1e3:
-        return f"{fee/1e3:.2f}K"
-    else:
-        return f"{fee:.2f}"
+    # 2. Create a formatted fee for every country at once
+    fee_str = format_fees(raw_fee)
+
+    # 3. Swap the values into a copy of the prebuilt figure (the template itself is never modified)
+    template = choropleth_template()
+    trace = dict(template['data'][0])
+    trace['z'] = fee_m
+    trace['customdata'] = np.column_stack([trace['locations'], fee_str])
+
+    layout = dict(template['layout'])
+    layout['coloraxis'] = dict(layout['coloraxis'], cmax=fee_m.max() if fee_m.max() > 0 else 1)
+
+    return {'data': [trace], 'layout': layout}
+
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
+def update_choropleth(year_range):
+    # 1. Sum the precomputed fees (> 0) of every country over the selected years
+    return choropleth_figure(country_fees.totals(year_range))
+
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
+def update_time_tab(year_range):
+    """Build all four Time Based figures for one slider value, filtering the data once."""
+    # The two cube charts share one selection of cells, the scatter one slice of rows
+    cells = fee_cube.select(years=year_range)
+    return (
+        max_fee_bar_figure(cells, year_range),
+        top5_league_line_figure(cells),
+        scatter_age_figure(rows_in_years(year_range)),
+        choropleth_figure(country_fees.totals(year_range)),
+    )
+
+TIME_TAB_OUTPUTS = [
+    ('graph-max-fee', update_max_fee_bar),
+    ('top5-league-line', update_top5_league_line),
+    ('transfer-fee-vs-age', update_scatter_age),
+    ('transfer-fee-choropleth', update_choropleth),
+]
+
+if TIME_TAB_PROGRESSIVE:
+    # One callback per figure: four requests, each chart drawn as soon as its own is done
+    for output_id, callback in TIME_TAB_OUTPUTS:
+        app.callback(Output(output_id, 'figure'), Input('year-slider', 'value'), prevent_initial_call=True)(callback)
+else:
+    # One request per slider move returning the four figures together
+    app.callback(
+        [Output(output_id, 'figure') for output_id, _ in TIME_TAB_OUTPUTS],
+        Input('year-slider', 'value'),
+        prevent_initial_call=True
+    )(update_time_tab)
 
 # Total Transfer Fees by League (All Time)
 @app.callback(
     Output('league-total-fees-bar', 'figure'),
     [Input('age-range-slider', 'value'),
      Input('position-checklist', 'value'),
-     Input('foot-dropdown', 'value')]
+     Input('foot-dropdown', 'value')],
+    prevent_initial_call=True
 )
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_league_total_fees_bar(age_range, positions, foot_values):
     min_age, max_age = age_range
     
-    # Filter based on age, position, and foot
-    filtered = master_df[
-        (master_df['player_age'] >= min_age) &
-        (master_df['player_age'] <= max_age) &
-        (master_df['position'].isin(positions)) &
-        (master_df['foot'].isin(foot_values)) &
-        (master_df['transfer_fee'] > 0)
-    ]
+    # Filter the fee cube based on age, position, and foot
+    cells = fee_cube.select(ages=(min_age, max_age), paid_only=True, position=positions, foot=foot_values)
     
     # Group by league (using league_name_to) and sum transfer fees
-    league_fees = filtered.groupby('league_name_to')['transfer_fee'].sum().reset_index()
+    league_fees = fee_cube.aggregate(cells, ['league_name_to'])
     
     overall_max = league_fees['transfer_fee'].max()
-    scale_col, scale_suffix = pick_scale_column(overall_max)
-    if scale_col == 'transfer_fee_m':
-        league_fees['scaled_fee'] = league_fees['transfer_fee'] / 1e6
-    elif scale_col == 'transfer_fee_b':
-        league_fees['scaled_fee'] = league_fees['transfer_fee'] / 1e9
-    elif scale_col == 'transfer_fee_t':
-        league_fees['scaled_fee'] = league_fees['transfer_fee'] / 1e3
-    else:
-        league_fees['scaled_fee'] = league_fees['transfer_fee']
+    scale, scale_suffix = fee_scale(overall_max)
+    league_fees['scaled_fee'] = league_fees['transfer_fee'] / scale
 
     # Create a bar chart and sort leagues by descending fee
     fig_bar = px.bar(
@@ -636,142 +868,174 @@ def update_league_total_fees_bar(age_range, positions, foot_values):
     
     return fig_bar
 
+def race_animation(duration):
+    """Return the animate options of the race charts' play button and slider steps."""
+    # Bars only move and grow between frames, so they can transition without a full redraw
+    return {
+        'frame': {'duration': duration, 'redraw': False},
+        'mode': 'immediate',
+        'fromcurrent': True,
+        'transition': {'duration': duration, 'easing': 'linear'}
+    }
+
+def race_figure(race, entity, title, labels):
+    """Build an animated bar chart race from race_frames rows, sorted by year then rank.
+
+    A single bar trace holds every entity that ever makes the chart, in a fixed
+    order with its own colour. In the years an entity is not in the chart its
+    bar waits just below the last rank, out of view, with its nearest fee, so
+    it slides in and out. Only the fees and ranks therefore change between
+    frames, and each frame carries just those of them that differ from the
+    previous year, which it names as its baseframe (plotly.js merges the chain
+    when jumping to a year).
+    """
+    years = pd.unique(race['transfer_year'])
+    names = pd.unique(np.asarray(race[entity], dtype=object))
+    if len(years) == 0:
+        return go.Figure(go.Bar(orientation='h'), layout={'title': title})
+
+    # Fee and rank of every entity in every year; out of the chart, the rank below the last
+    year_pos = np.searchsorted(years, race['transfer_year'].values)
+    slot = pd.Index(names).get_indexer(np.asarray(race[entity], dtype=object))
+    fees = np.full((len(years), len(names)), np.nan)
+    fees[year_pos, slot] = race['cumulative_fee'].values
+    fees = pd.DataFrame(fees).ffill().bfill().values
+    last_rank = int(race['rank'].max())
+    ranks = np.full((len(years), len(names)), last_rank + 1)
+    ranks[year_pos, slot] = race['rank'].values
+
+    frames = []
+    for i, year in enumerate(years):
+        trace = {'meta': int(year)}
+        if i == 0 or not np.array_equal(fees[i], fees[i - 1]):
+            trace['x'] = fees[i]
+        if i == 0 or not np.array_equal(ranks[i], ranks[i - 1]):
+            trace['y'] = ranks[i]
+        frame = {'name': str(year), 'traces': [0], 'data': [trace]}
+        if i > 0:
+            frame['baseframe'] = str(years[i - 1])
+        frames.append(frame)
+
+    # Colours of the template's colorway in order of first appearance, as px assigns them
+    colorway = pio.templates[pio.templates.default].layout.colorway
+    bars = go.Bar(
+        x=fees[0],
+        y=ranks[0],
+        text=names,
+        meta=int(years[0]),
+        orientation='h',
+        textposition='auto',
+        marker_color=[colorway[i % len(colorway)] for i in range(len(names))],
+        hovertemplate=f"{labels[entity]}=%{{text}}<br>Year=%{{meta}}<br>{labels['cumulative_fee']}=%{{x}}<br>Rank=%{{y}}<extra></extra>"
+    )
+    return go.Figure(bars, frames=frames, layout={
+        'title': title,
+        'xaxis': {'title': labels['cumulative_fee'], 'range': [0, fees.max() * 1.1]},
+        # Rank 1 at the top, and the entities out of the chart just below the axis
+        'yaxis': {'title': 'Rank', 'range': [last_rank + 0.5, 0.5]},
+        'updatemenus': [{
+            'buttons': [
+                {'args': [None, race_animation(500)], 'label': '&#9654;', 'method': 'animate'},
+                {'args': [[None], race_animation(0)], 'label': '&#9724;', 'method': 'animate'}
+            ],
+            'direction': 'left', 'pad': {'r': 10, 't': 70}, 'showactive': False, 'type': 'buttons',
+            'x': 0.1, 'xanchor': 'right', 'y': 0, 'yanchor': 'top'
+        }],
+        'sliders': [{
+            'active': 0, 'currentvalue': {'prefix': 'Year='}, 'len': 0.9, 'pad': {'b': 10, 't': 60},
+            'steps': [{'args': [[frame['name']], race_animation(0)], 'label': frame['name'], 'method': 'animate'} for frame in frames],
+            'x': 0.1, 'xanchor': 'left', 'y': 0, 'yanchor': 'top'
+        }]
+    })
+
 # Accumulative Total Transfer Fees by League Over Time
 @app.callback(
     Output('leagues-race', 'figure'),
     [Input('age-range-slider', 'value'),
      Input('position-checklist', 'value'),
-     Input('foot-dropdown', 'value')]
+     Input('foot-dropdown', 'value')],
+    prevent_initial_call=True
 )
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_leagues_race(age_range, positions, foot_values):
     min_age, max_age = age_range
-    # Filter data based on selected filters
-    filtered = master_df[
-        (master_df['player_age'] >= min_age) &
-        (master_df['player_age'] <= max_age) &
-        (master_df['position'].isin(positions)) &
-        (master_df['foot'].isin(foot_values))
-    ]
+    # Filter the fee cube based on selected filters
+    cells = fee_cube.select(ages=(min_age, max_age), position=positions, foot=foot_values)
     
     # Group data by year and league, summing fees
-    league_year = filtered.groupby(['transfer_year', 'league_name_to'])['transfer_fee'].sum().reset_index()
-
-    # If you prefer a cumulative sum (accumulative fees up to that year), you can compute it like this:
-    league_year = league_year.sort_values(['league_name_to', 'transfer_year'])
-    league_year['cumulative_fee'] = league_year.groupby('league_name_to')['transfer_fee'].cumsum()
-    # Then use x='cumulative_fee' in the chart.
+    league_year = fee_cube.aggregate(cells, ['transfer_year', 'league_name_to'])
 
-    league_year = league_year.sort_values(['transfer_year', 'cumulative_fee'], ascending=[True, False])
-    league_year = league_year.groupby('transfer_year').head(5)
+    # Accumulate fees per league over the years and keep the top 5 leagues each year, ranked
+    league_year = race_frames(league_year, 'league_name_to', 5)
 
-    def assign_rank(df):
-        df['rank'] = range(1, len(df) + 1)
-        return df
-
-    league_year = league_year.groupby('transfer_year', group_keys=True).apply(assign_rank).reset_index(drop=True)
-
-    # Create the animated bar chart (horizontal)
-    fig_race = px.bar(
+    # Create the animated bar chart (horizontal, rank 1 at the top)
+    return race_figure(
         league_year,
-        # x='transfer_fee',
-        x='cumulative_fee',
-        y='rank',
-        color='league_name_to',
-        orientation='h',
-        animation_frame='transfer_year',
-        text='league_name_to',  # <-- pass the column name here
-        range_x=[0, league_year['cumulative_fee'].max() * 1.1],
+        'league_name_to',
         title='Accumulative Transfer Fees Over Time by League',
-        labels={'cumulative_fee': 'Fees', 'league_name_to': 'League', 'transfer_year': 'Year', 'rank': 'Rank'}
+        labels={'cumulative_fee': 'Fees', 'league_name_to': 'League'}
     )
 
-    fig_race.update_layout(yaxis={'autorange': 'reversed'})
-
-    return fig_race
-
 @app.callback(
     Output('clubs-race', 'figure'),
     [Input('clubs-year-slider', 'value'),
-     Input('league-dropdown', 'value')]
+     Input('league-dropdown', 'value')],
+    prevent_initial_call=True
 )
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_clubs_race(year_range, selected_leagues):
     min_year, max_year = year_range
 
-    # 1. Filter data based on year range and selected leagues
-    filtered = master_df[
-        (master_df['transfer_year'] >= min_year) &
-        (master_df['transfer_year'] <= max_year) &
-        (master_df['league_name_to'].isin(selected_leagues))
-    ]
+    # 1. Filter the fee cube based on year range and selected leagues
+    cells = club_cube.select(years=(min_year, max_year), league_name_to=selected_leagues)
 
     # 2. Group data by (transfer_year, club_name_to), summing fees
-    clubs_year = filtered.groupby(['transfer_year', 'club_name_to'])['transfer_fee'].sum().reset_index()
-
-    # 3. Sort for cumsum if you want accumulative
-    clubs_year = clubs_year.sort_values(['club_name_to','transfer_year'])
-    clubs_year['cumulative_fee'] = clubs_year.groupby('club_name_to')['transfer_fee'].cumsum()
+    clubs_year = club_cube.aggregate(cells, ['transfer_year', 'club_name_to'])
 
-    # 4. Sort by (year, cumulative_fee) desc, pick top 20 clubs each year
-    clubs_year = clubs_year.sort_values(['transfer_year','cumulative_fee'], ascending=[True,False])
-    clubs_year = clubs_year.groupby('transfer_year').head(20)
+    # 3. Accumulate fees per club and keep the top 20 clubs each year, ranked
+    clubs_year = race_frames(clubs_year, 'club_name_to', 20)
 
-    # 5. Assign rank so we can do a bar chart race
-    def assign_rank(df):
-        df['rank'] = range(1, len(df)+1)
-        return df
-    clubs_year['rank'] = clubs_year.groupby('transfer_year')['cumulative_fee']\
-                              .rank(ascending=False, method='first').astype(int)
-
-
-    # 6. Build the race chart
-    fig_race = px.bar(
+    # 4. Build the race chart, one frame per year of the selected range
+    return race_figure(
         clubs_year,
-        x='cumulative_fee',
-        y='rank',
-        orientation='h',
-        color='club_name_to',
-        animation_frame='transfer_year',
-        text='club_name_to',
-        range_x=[0, clubs_year['cumulative_fee'].max() * 1.1],
+        'club_name_to',
         title='Accumulative Transfer Fees Over Time by Club',
-        labels={'cumulative_fee': 'Fees', 'club_name_to': 'Club', 'transfer_year': 'Year', 'rank': 'Rank'}
+        labels={'cumulative_fee': 'Fees', 'club_name_to': 'Club'}
     )
 
-    # Reverse the y-axis so rank=1 is at the top
-    fig_race.update_layout(yaxis={'autorange': 'reversed'})
-
-    return fig_race
-
-@app.callback(
-    Output('club-dropdown', 'options'),
-    [Input('league-dropdown', 'value')]
-)
+@dataset_lock.reading
+@instrument
 def update_club_options(selected_leagues):
-    # Filter the master_df for these leagues
-    sub_df = master_df[master_df['league_name_to'].isin(selected_leagues)]
-    clubs = sub_df['club_name_to'].unique()
-    return [{'label': c, 'value': c} for c in sorted(clubs)]
-
-@app.callback(
-    Output('clubs-bar', 'figure'),
-    [Input('clubs-year-slider', 'value'),
-     Input('league-dropdown', 'value'),
-     Input('club-dropdown', 'value')]
-)
+    # Clubs of the club cube cells in these leagues (labels are sorted, so are the codes)
+    cells = club_cube.select(league_name_to=selected_leagues)
+    codes = np.unique(cells['club_name_to'].values)
+    clubs = club_cube.labels['club_name_to'][codes[codes >= 0]]
+    return [{'label': c, 'value': c} for c in clubs]
+
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_clubs_bar(year_range, selected_leagues, selected_clubs):
     min_year, max_year = year_range
 
-    # 1. Filter data
-    filtered = master_df[
-        (master_df['transfer_year'] >= min_year) &
-        (master_df['transfer_year'] <= max_year) &
-        (master_df['league_name_to'].isin(selected_leagues))
-    ]
+    # 1. Filter the club cube
+    members = {'league_name_to': selected_leagues}
     if selected_clubs:  # if the user picked some clubs
-        filtered = filtered[filtered['club_name_to'].isin(selected_clubs)]
+        members['club_name_to'] = selected_clubs
+    cells = club_cube.select(years=(min_year, max_year), **members)
 
     # 2. Group by year, summing fees
-    year_fees = filtered.groupby('transfer_year')['transfer_fee'].sum().reset_index()
+    year_fees = club_cube.aggregate(cells, ['transfer_year'])
 
     # 3. Create a bar chart of total fees per year
     fig_bar = px.bar(
@@ -785,78 +1049,54 @@ def update_clubs_bar(year_range, selected_leagues, selected_clubs):
 
 @app.callback(
     Output('players-race', 'figure'),
-    Input('players-year-slider', 'value')
+    Input('players-year-slider', 'value'),
+    prevent_initial_call=True
 )
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_players_race(year_range):
     min_year, max_year = year_range
 
-    # Filter data for the selected year range
-    filtered = master_df[(master_df['transfer_year'] >= min_year) &
-                         (master_df['transfer_year'] <= max_year)].copy()
-
-    # Group by (transfer_year, player_name) and sum transfer fees for that year
-    players_year = filtered.groupby(['transfer_year', 'player_name'])['transfer_fee'].sum().reset_index(name='year_fee')
-
-    # Sort by player then by year and compute cumulative fees for each player
-    players_year = players_year.sort_values(['player_name', 'transfer_year'])
-    players_year['cumulative_fee'] = players_year.groupby('player_name')['year_fee'].cumsum()
-
-    # For each year, sort players descending by cumulative_fee and select top 10 players
-    players_year = players_year.sort_values(['transfer_year', 'cumulative_fee'], ascending=[True, False])
-    players_year = players_year.groupby('transfer_year').head(10)
-
-    # Assign rank within each year (highest cumulative_fee gets rank 1)
-    players_year['rank'] = players_year.groupby('transfer_year')['cumulative_fee']\
-                                       .rank(ascending=False, method='first').astype(int)
+    # Top 10 players each year by fees accumulated since min_year, ranked (highest cumulative_fee gets rank 1)
+    players_year = players_race.frames((min_year, max_year), 10)
 
-    # Create the animated bar chart
-    fig_race = px.bar(
+    # Create the animated bar chart, one frame per year of the selected range
+    return race_figure(
         players_year,
-        x='cumulative_fee',
-        y='rank',
-        color='player_name',
-        orientation='h',
-        animation_frame='transfer_year',
-        text='player_name',
-        range_x=[0, players_year['cumulative_fee'].max() * 1.1],
+        'player_name',
         title='Accumulative Transfer Fees Over Time by Player',
-        labels={'cumulative_fee': 'Cumulative Fee', 'player_name': 'Player', 'transfer_year': 'Year', 'rank': 'Rank'}
+        labels={'cumulative_fee': 'Cumulative Fee', 'player_name': 'Player'}
     )
 
-    # Reverse the y-axis so that rank=1 appears at the top
-    fig_race.update_layout(yaxis={'autorange': 'reversed'})
-
-    return fig_race
+@timed('aggregate')
+def median_fee_by_foot(filtered):
+    """Return the median positive fee per preferred foot, as a frame sorted by foot."""
+    filtered = filtered[filtered['transfer_fee'] > 0]
+    return filtered.groupby('foot', observed=True)['transfer_fee'].median().sort_index().reset_index()
 
-@app.callback(
-    Output('players-foot-bar', 'figure'),
-    Input('players-year-slider', 'value')
-)
+@request_guard.guard
+@dataset_lock.reading
+@instrument
+@figure_cache.memoize
+@compact_figures
 def update_players_foot_bar(year_range):
     min_year, max_year = year_range
 
-    # Filter data for the selected year range (or use full data if you prefer)
-    filtered = master_df[(master_df['transfer_year'] >= min_year) &
-                         (master_df['transfer_year'] <= max_year)]
-    
-    filtered = filtered[filtered['transfer_fee'] > 0]
-    
-    # Group by preferred foot and compute median transfer fee
-    foot_median = filtered.groupby('foot')['transfer_fee'].median().reset_index()
+    # Median transfer fee per preferred foot over the selected year range
+    if foot_quantiles.sizes((min_year, max_year)).sum() > QUANTILE_EXACT_ROWS:
+        foot_median = foot_quantiles.quantiles((min_year, max_year), [0.5]).rename(columns={'p50': 'transfer_fee'})
+    else:
+        foot_median = median_fee_by_foot(rows_in_years((min_year, max_year)))
 
-    # Determine the appropriate scaling using pick_scale_column based on maximum median fee
+    # Determine the appropriate scaling based on maximum median fee
     overall_max = foot_median['transfer_fee'].max()
-    scale_col, scale_suffix = pick_scale_column(overall_max)
+    scale, scale_suffix = fee_scale(overall_max)
 
     # Scale the median fee values accordingly
-    if scale_col == 'transfer_fee_b':
-        foot_median['scaled_median'] = foot_median['transfer_fee'] / 1e9
-    elif scale_col == 'transfer_fee_m':
-        foot_median['scaled_median'] = foot_median['transfer_fee'] / 1e6
-    elif scale_col == 'transfer_fee_t':
-        foot_median['scaled_median'] = foot_median['transfer_fee'] / 1e3
-    else:
-        foot_median['scaled_median'] = foot_median['transfer_fee']
+    foot_median['scaled_median'] = foot_median['transfer_fee'] / scale
 
     # Create the bar chart for median fees by preferred foot
     fig = px.bar(
@@ -868,6 +1108,145 @@ def update_players_foot_bar(year_range):
     )
     return fig
 
+if CLIENTSIDE_FILTERING:
+    app.clientside_callback(
+        ClientsideFunction(namespace='transfers', function_name='clubOptions'),
+        Output('club-dropdown', 'options'),
+        Input('league-dropdown', 'value'),
+        State('clientside-tables', 'data'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='transfers', function_name='clubsBar'),
+        Output('clubs-bar', 'figure'),
+        [Input('clubs-year-slider', 'value'),
+         Input('league-dropdown', 'value'),
+         Input('club-dropdown', 'value')],
+        State('clientside-tables', 'data'),
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace='transfers', function_name='footBar'),
+        Output('players-foot-bar', 'figure'),
+        Input('players-year-slider', 'value'),
+        State('clientside-tables', 'data'),
+        prevent_initial_call=True
+    )
+else:
+    app.callback(
+        Output('club-dropdown', 'options'),
+        [Input('league-dropdown', 'value')],
+        prevent_initial_call=True
+    )(update_club_options)
+    app.callback(
+        Output('clubs-bar', 'figure'),
+        [Input('clubs-year-slider', 'value'),
+         Input('league-dropdown', 'value'),
+         Input('club-dropdown', 'value')],
+        prevent_initial_call=True
+    )(update_clubs_bar)
+    app.callback(
+        Output('players-foot-bar', 'figure'),
+        Input('players-year-slider', 'value'),
+        prevent_initial_call=True
+    )(update_players_foot_bar)
+
+def build_default_outputs(tab_id):
+    """Render a tab's figures, and the club options, for the inputs a new visitor starts from.
+
+    They go through the memoized callbacks, so workers share them through the
+    figure cache's disk (or Redis) tier, which is keyed by dataset version.
+    """
+    years, leagues = default_years(), default_leagues()
+    if tab_id == "tab-time":
+        return dict(zip([output_id for output_id, _ in TIME_TAB_OUTPUTS], update_time_tab(years)))
+    if tab_id == "tab-leagues":
+        return {
+            'league-total-fees-bar': update_league_total_fees_bar(DEFAULT_AGE_RANGE, DEFAULT_POSITIONS, DEFAULT_FEET),
+            'leagues-race': update_leagues_race(DEFAULT_AGE_RANGE, DEFAULT_POSITIONS, DEFAULT_FEET),
+        }
+    if tab_id == "tab-clubs":
+        return {
+            'clubs-race': update_clubs_race(years, leagues),
+            'club-dropdown': update_club_options(leagues),
+            'clubs-bar': update_clubs_bar(years, leagues, None),
+        }
+    return {
+        'players-race': update_players_race(years),
+        'players-foot-bar': update_players_foot_bar(years),
+    }
+
+def warm_tab_layouts():
+    """Build every tab's layout, Time Based first, so visitors find them ready."""
+    try:
+        for tab_id in TAB_IDS:
+            render_tab_content(tab_id)
+    except Exception as e:  # the tabs are then built by the first request for them
+        print(f"Warning: could not prebuild the tab layouts: {e}")
+
+def touch_template_defaults():
+    """Create the parts of the default template every px figure reads, in the importing thread.
+
+    plotly builds a template's child objects on first access, which is not
+    thread-safe: two threads building their first px figures at once (the
+    tab warm-up and a request) can corrupt the template all figures share.
+    """
+    template = pio.templates[pio.templates.default]
+    layout = template.layout
+    layout.colorscale.sequential, layout.colorway, layout.margin.t, layout.legend.itemsizing
+    layout.xaxis.showgrid, layout.yaxis.showgrid
+    for scatter in template.data.scatter:
+        scatter.marker.symbol, scatter.line.dash
+    for bar in template.data.bar:
+        bar.marker.pattern.shape
+
+touch_template_defaults()
+
+# Rendering the default figures is left out of the import, so a worker starts serving at
+# once; a page requested before its tab is ready builds that tab itself
+tab_warmup = threading.Thread(target=warm_tab_layouts, name='tab-warmup', daemon=True)
+tab_warmup.start()
+
+def apply_deltas(frames, deltas):
+    """Add newly ingested delta frames to the dashboard data and swap it in.
+
+    Aggregates are extended from the delta rows only and built before any
+    callback is held back; the swap itself just rebinds the module globals.
+    """
+    global master_df, applied_deltas, year_index, fee_cube, club_cube, players_race, foot_quantiles, country_fees
+    global clientside_tables, layout_statics, tab_layouts
+    new_cube, new_club_cube, new_race, new_quantiles, new_countries = fee_cube, club_cube, players_race, foot_quantiles, country_fees
+    for delta in frames:
+        new_cube = new_cube.appended(delta)
+        new_club_cube = new_club_cube.appended(delta)
+        new_race = new_race.appended(delta)
+        new_quantiles = new_quantiles.appended(delta)
+        new_countries = new_countries.appended(delta)
+
+    # In shared mode the rebuilt shared file already holds the delta rows, so map it instead of copying
+    new_df, stored, _ = load_master(shared=True) if SHARED_DATASET else (None, None, None)
+    if stored != deltas:
+        new_df = master_df
+        for delta in frames:
+            new_df = append_rows(new_df, delta)
+    new_year_index = YearIndex(new_df['transfer_year'].values)
+
+    with dataset_lock.swapping():
+        master_df, applied_deltas = new_df, deltas
+        year_index, fee_cube, club_cube, players_race, country_fees = new_year_index, new_cube, new_club_cube, new_race, new_countries
+        foot_quantiles = new_quantiles
+        figure_cache.set_version(f"{dataset_version(source_hash, deltas)}-{source_fingerprint(BASE_DIR)}")
+        layout_statics = build_layout_statics()
+        if CLIENTSIDE_FILTERING:
+            clientside_tables = build_clientside_tables()
+        tab_layouts = {}
+    warm_tab_layouts()
+    print(f"Dataset updated: {len(master_df)} rows after {len(deltas)} ingested deltas")
+
+# Watch the ingest directory for delta files while the app runs (see ingest.py)
+if os.path.isdir(INGEST_DIR):
+    DeltaWatcher(applied_deltas, apply_deltas).start()
+
 server = app.server
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+// Clientside callbacks registered by app.py. showTab switches tabs without a request.
+// The club options, clubs bar and preferred foot functions replace their Python
+// counterparts when CLIENTSIDE_FILTERING=1: they read the tables app.py ships once in
+// the 'clientside-tables' store and must give the same results.
+
+// Same units as fees.FEE_UNITS: (divisor, axis suffix) for the largest value of a chart
+function feeScale(maxFee) {
+    var units = [[1e9, 'B'], [1e6, 'M'], [1e3, 'K']];
+    for (var i = 0; i < units.length; i++) {
+        if (maxFee >= units[i][0]) {
+            return [units[i][0], '(' + units[i][1] + ')'];
+        }
+    }
+    return [1, ''];
+}
+
+// Positions of the selected labels in names, as a lookup table over the codes
+function selectedCodes(names, selected) {
+    var wanted = {};
+    (selected || []).forEach(function (name) { wanted[name] = true; });
+    return names.map(function (name) { return wanted[name] === true; });
+}
+
+// Copy of a prebuilt figure with new bar values and title
+function barFigure(template, x, y, title) {
+    var trace = Object.assign({}, template.data[0], {x: x, y: y});
+    var layout = Object.assign({}, template.layout);
+    if (title !== undefined) {
+        layout.title = Object.assign({}, layout.title, {text: title});
+    }
+    return {data: [trace], layout: layout};
+}
+
+// Container ids of the tabs, in the order app.py lists their outputs (TAB_IDS)
+var TAB_IDS = ['tab-time', 'tab-leagues', 'tab-clubs', 'tab-players'];
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    transfers: {
+        // Show the active tab's container and hide the others. The first time a tab is
+        // opened it is also requested from the server (render_requested_tab).
+        showTab: function (activeTab, renderedTabs) {
+            var noUpdate = window.dash_clientside.no_update;
+            var styles = TAB_IDS.map(function (tabId) {
+                return tabId === activeTab ? {} : {display: 'none'};
+            });
+            var rendered = renderedTabs || [];
+            if (rendered.indexOf(activeTab) >= 0) {
+                return styles.concat([noUpdate, noUpdate]);
+            }
+            return styles.concat([activeTab, rendered.concat([activeTab])]);
+        },
+
+        // update_club_options: every club seen in the selected leagues, sorted
+        clubOptions: function (selectedLeagues, tables) {
+            var t = tables.clubs;
+            var leagues = selectedCodes(t.league_names, selectedLeagues);
+            var seen = {};
+            for (var i = 0; i < t.leagues.length; i++) {
+                if (leagues[t.leagues[i]] && t.clubs[i] >= 0) {
+                    seen[t.clubs[i]] = true;
+                }
+            }
+            // club_names is sorted, so sorting the codes sorts the names
+            return Object.keys(seen).map(Number).sort(function (a, b) { return a - b; }).map(function (code) {
+                return {label: t.club_names[code], value: t.club_names[code]};
+            });
+        },
+
+        // update_clubs_bar: total fees per year of the selected leagues (and clubs, if any)
+        clubsBar: function (yearRange, selectedLeagues, selectedClubs, tables) {
+            var t = tables.clubs;
+            var leagues = selectedCodes(t.league_names, selectedLeagues);
+            var anyClub = selectedClubs && selectedClubs.length > 0;
+            var clubs = selectedCodes(t.club_names, selectedClubs);
+
+            var totals = {};
+            for (var i = 0; i < t.years.length; i++) {
+                var year = t.years[i];
+                if (year < yearRange[0] || year > yearRange[1] || !leagues[t.leagues[i]]) {
+                    continue;
+                }
+                if (anyClub && !(t.clubs[i] >= 0 && clubs[t.clubs[i]])) {
+                    continue;
+                }
+                totals[year] = (totals[year] || 0) + t.fees[i];
+            }
+
+            var years = Object.keys(totals).map(Number).sort(function (a, b) { return a - b; });
+            var fees = years.map(function (year) { return totals[year]; });
+            return barFigure(tables.clubs_bar, years, fees);
+        },
+
+        // update_players_foot_bar: median positive fee per preferred foot over the years
+        footBar: function (yearRange, tables) {
+            var t = tables.feet;
+            var entries = t.foot_names.map(function () { return []; });
+            for (var i = 0; i < t.years.length; i++) {
+                if (t.years[i] >= yearRange[0] && t.years[i] <= yearRange[1]) {
+                    entries[t.feet[i]].push([t.fees[i], t.counts[i]]);
+                }
+            }
+
+            var feet = [];
+            var medians = [];
+            entries.forEach(function (counted, code) {
+                if (counted.length === 0) {
+                    return;
+                }
+                counted.sort(function (a, b) { return a[0] - b[0]; });
+                var n = counted.reduce(function (sum, entry) { return sum + entry[1]; }, 0);
+                // Values at the two middle positions (the same one when n is odd)
+                var lowPos = Math.floor((n - 1) / 2), highPos = Math.floor(n / 2);
+                var low, high, seen = 0;
+                for (var j = 0; j < counted.length && high === undefined; j++) {
+                    seen += counted[j][1];
+                    if (low === undefined && seen > lowPos) { low = counted[j][0]; }
+                    if (seen > highPos) { high = counted[j][0]; }
+                }
+                feet.push(t.foot_names[code]);
+                medians.push((low + high) / 2);
+            });
+
+            var scale = feeScale(Math.max.apply(null, medians));
+            var yLabel = 'Median Fee ' + scale[1];
+            var fig = barFigure(
+                tables.foot_bar,
+                feet,
+                medians.map(function (median) { return median / scale[0]; }),
+                'Median Transfer Fee by Preferred Foot ' + scale[1]
+            );
+            fig.data[0].hovertemplate = 'Preferred Foot=%{x}<br>' + yLabel + '=%{y}<extra></extra>';
+            fig.layout.yaxis = Object.assign({}, fig.layout.yaxis, {title: {text: yLabel}});
+            return fig;
+        }
+    }
+});
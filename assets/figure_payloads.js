@@ -0,0 +1,119 @@
+// Decodes the compact figures of payloads.py before plotly.js draws them: base64 typed
+// arrays, labelled (deduplicated) string arrays and templates referred to by name
+// (window.figureTemplates, sent with the page). Plain figures pass through unchanged.
+
+var TYPED_ARRAYS = {
+    i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+    i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+};
+
+// Nested arrays of the given shape over a flat array (rows are views, not copies)
+function reshape(flat, shape) {
+    if (shape.length <= 1) {
+        return flat;
+    }
+    var rowSize = flat.length / shape[0];
+    var rows = [];
+    for (var i = 0; i < shape[0]; i++) {
+        rows.push(reshape(flat.subarray ? flat.subarray(i * rowSize, (i + 1) * rowSize) : flat.slice(i * rowSize, (i + 1) * rowSize), shape.slice(1)));
+    }
+    return rows;
+}
+
+function decodeTyped(spec) {
+    var binary = atob(spec.bdata);
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    var flat = new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+    return {flat: flat, shape: spec.shape ? String(spec.shape).split(',').map(Number) : [flat.length]};
+}
+
+function decodeValue(value) {
+    if (value === null || typeof value !== 'object' || Array.isArray(value) || ArrayBuffer.isView(value)) {
+        return value;
+    }
+    if (typeof value.bdata === 'string' && TYPED_ARRAYS[value.dtype]) {
+        var typed = decodeTyped(value);
+        return reshape(typed.flat, typed.shape);
+    }
+    if (Array.isArray(value.labels) && value.codes) {
+        var codes = decodeTyped(value.codes);
+        var labels = Array.prototype.map.call(codes.flat, function (code) { return value.labels[code]; });
+        return reshape(labels, codes.shape);
+    }
+    var decoded = {};
+    Object.keys(value).forEach(function (key) { decoded[key] = decodeValue(value[key]); });
+    return decoded;
+}
+
+function decodeTraces(traces) {
+    return Array.isArray(traces) ? traces.map(decodeValue) : traces;
+}
+
+function decodeLayout(layout) {
+    if (!layout || typeof layout.template !== 'string') {
+        return layout;
+    }
+    var templates = window.figureTemplates || {};
+    var decoded = Object.assign({}, layout);
+    if (templates[layout.template]) {
+        decoded.template = templates[layout.template];
+    } else {
+        delete decoded.template;
+    }
+    return decoded;
+}
+
+// Frames (or frame names, left as they are)
+function decodeFrames(frames) {
+    return Array.isArray(frames) ? frames.map(decodeFigure) : frames;
+}
+
+function decodeFigure(figure) {
+    if (!figure || typeof figure !== 'object' || Array.isArray(figure)) {
+        return figure;
+    }
+    var decoded = Object.assign({}, figure);
+    if (figure.data) { decoded.data = decodeTraces(figure.data); }
+    if (figure.layout) { decoded.layout = decodeLayout(figure.layout); }
+    if (figure.frames) { decoded.frames = decodeFrames(figure.frames); }
+    return decoded;
+}
+
+// dcc.Graph calls these on the global Plotly, which it only loads when the first graph mounts
+function wrapPlotly(Plotly) {
+    if (!Plotly || Plotly.figurePayloadsDecoded) {
+        return Plotly;
+    }
+    ['newPlot', 'react'].forEach(function (name) {
+        var plot = Plotly[name];
+        Plotly[name] = function (gd, data, layout, config) {
+            if (Array.isArray(data)) {
+                return plot.call(this, gd, decodeTraces(data), decodeLayout(layout), config);
+            }
+            return plot.call(this, gd, decodeFigure(data));
+        };
+    });
+    var animate = Plotly.animate;
+    Plotly.animate = function (gd, frameOrGroupNameOrFrameList, animationOpts) {
+        var frames = Array.isArray(frameOrGroupNameOrFrameList) ? decodeFrames(frameOrGroupNameOrFrameList) : decodeFigure(frameOrGroupNameOrFrameList);
+        return animate.call(this, gd, frames, animationOpts);
+    };
+    var addFrames = Plotly.addFrames;
+    Plotly.addFrames = function (gd, frameList, indices) {
+        return addFrames.call(this, gd, decodeFrames(frameList), indices);
+    };
+    Plotly.figurePayloadsDecoded = true;
+    return Plotly;
+}
+
+(function () {
+    var plotly = wrapPlotly(window.Plotly);
+    Object.defineProperty(window, 'Plotly', {
+        configurable: true,
+        get: function () { return plotly; },
+        set: function (value) { plotly = wrapPlotly(value); }
+    });
+})();
@@ -0,0 +1,19 @@
+// Tags the callback requests of this page with an id of its own (X-Dash-Page, see
+// request_guard.py), so a request is only ever dropped for a newer one of the same page,
+// never for one of another tab of the same browser.
+
+(function () {
+    var bytes = new Uint8Array(16);
+    window.crypto.getRandomValues(bytes);
+    var pageId = Array.prototype.map.call(bytes, function (b) { return ('0' + b.toString(16)).slice(-2); }).join('');
+
+    // dash-renderer posts every callback with the global fetch
+    var fetch = window.fetch;
+    window.fetch = function (input, init) {
+        if (typeof input === 'string' && input.indexOf('_dash-update-component') !== -1) {
+            init = Object.assign({}, init);
+            init.headers = Object.assign({}, init.headers, {'X-Dash-Page': pageId});
+        }
+        return fetch.call(this, input, init);
+    };
+})();
@@ -0,0 +1,259 @@
+"""Benchmark of every dashboard callback, called directly rather than over HTTP.
+
+    python benchmark.py                      # 1x, 10x and 100x the bundled CSV
+    python benchmark.py --scales 1 10 --repeat 20
+    python benchmark.py --save-baseline      # store the results as the baseline
+    python benchmark.py --compare            # exit with 1 when a case got slower than the baseline
+    python benchmark.py --synthetic --scales 40 400   # ~1M and ~11M rows from synthetic_data.py
+
+Each scale is a copy of the bundled CSV resampled (with replacement) to
+scale times its rows, or with --synthetic a dataset of that many rows made
+by synthetic_data.py (more players, clubs and leagues, as real data of that
+size would have). It is written with its snapshot under .benchmark/ and
+reused by later runs. Every scale runs in its own process, which imports
+app.py with DASH_DATA_DIR pointing at that copy, so the startup work
+(aggregates, default figures) is measured too.
+
+Callbacks are unwrapped (inspect.unwrap) down to the function that builds
+the figure, so the request guard, the dataset lock and the figure cache are
+bypassed and every call does the full work. For every case the report gives
+the latency percentiles over --repeat calls, the peak memory allocated by one
+call (tracemalloc) and the size of its response: as plain JSON, as compact
+JSON (payloads.compact_outputs, what the app sends) and once that is brotli
+compressed like the app's responses.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from data_store import BASE_DIR, CSV_PATH, build_snapshot, is_current, read_snapshot_schema
+from synthetic_data import generate_dataset
+
+BENCH_DIR = os.path.join(BASE_DIR, '.benchmark')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'latest.json')
+DEFAULT_SCALES = [1, 10, 100]
+PERCENTILES = [50, 90, 99]
+
+
+def scaled_dataset(scale, synthetic=False, seed=0):
+    """Return the data directory of a dataset with scale times the rows of the bundled CSV, building it if needed."""
+    data_dir = os.path.join(BENCH_DIR, f"{'synthetic-' if synthetic else ''}x{scale}")
+    csv_path = os.path.join(data_dir, os.path.basename(CSV_PATH))
+    snapshot_path = os.path.join(data_dir, 'master_snapshot.npz')
+    os.makedirs(data_dir, exist_ok=True)
+
+    if not os.path.exists(csv_path):
+        source = pd.read_csv(CSV_PATH)
+        if synthetic:
+            print(f"Generating the synthetic {scale}x dataset...", file=sys.stderr)
+            generate_dataset(len(source) * scale, data_dir, seed)
+        elif scale == 1:
+            shutil.copyfile(CSV_PATH, csv_path)
+        else:
+            print(f"Generating the {scale}x dataset...", file=sys.stderr)
+            sample = source.sample(n=len(source) * scale, replace=True, random_state=seed)
+            tmp_path = csv_path + '.tmp'
+            sample.to_csv(tmp_path, index=False, compression={'method': 'gzip', 'compresslevel': 1})
+            os.replace(tmp_path, csv_path)
+
+    if not os.path.exists(snapshot_path) or not is_current(read_snapshot_schema(snapshot_path), csv_path):
+        build_snapshot(csv_path, snapshot_path)
+    return data_dir
+
+
+def benchmark_cases(app):
+    """Return (callback name, case name, args) for realistic and worst-case inputs of every callback."""
+    statics = app.layout_statics
+    default, full = app.default_years(), [statics['first_year'], statics['last_year']]
+    narrow = [statics['last_year'], statics['last_year']]
+    leagues, all_leagues = app.default_leagues(), statics['leagues']
+    all_clubs = [str(club) for club in app.club_cube.labels['club_name_to']]
+    all_ages = [statics['min_age'], statics['max_age']]
+    filters = {
+        'default': (app.DEFAULT_AGE_RANGE, app.DEFAULT_POSITIONS, app.DEFAULT_FEET),
+        'all': (all_ages, app.DEFAULT_POSITIONS, app.DEFAULT_FEET),
+        'narrow': ([25, 25], ['Goalkeeper'], ['left']),
+    }
+
+    cases = []
+    for name in ['update_time_tab', 'update_players_race', 'update_players_foot_bar']:
+        cases += [(name, 'default', (default,)), (name, 'full', (full,)), (name, 'narrow', (narrow,))]
+    for name in ['update_max_fee_bar', 'update_top5_league_line', 'update_scatter_age', 'update_choropleth']:
+        cases.append((name, 'full', (full,)))
+    for name in ['update_league_total_fees_bar', 'update_leagues_race']:
+        cases += [(name, case, args) for case, args in filters.items()]
+    cases += [
+        ('update_clubs_race', 'default', (default, leagues)),
+        ('update_clubs_race', 'all_leagues', (full, all_leagues)),
+        ('update_clubs_race', 'narrow', (narrow, leagues[:1])),
+        ('update_club_options', 'default', (leagues,)),
+        ('update_club_options', 'all_leagues', (all_leagues,)),
+        ('update_clubs_bar', 'default', (default, leagues, None)),
+        ('update_clubs_bar', 'all_clubs', (full, all_leagues, all_clubs)),
+        ('update_clubs_bar', 'narrow', (narrow, leagues[:1], None)),
+    ]
+    return cases
+
+
+def measure(func, args, repeat):
+    """Return the latency percentiles, peak allocation and response sizes of func(*args)."""
+    import brotli
+    from plotly.io.json import to_json_plotly
+
+    from payloads import compact_outputs
+
+    func(*args)  # warm-up: lazy imports, first-use caches
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    # One more call under tracemalloc, which slows it down too much to time it
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    payload = to_json_plotly(result)
+    json_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compact = to_json_plotly(compact_outputs(result)).encode('utf-8')
+    compact_seconds = time.perf_counter() - start
+
+    stats = {f"p{p}_ms": float(np.percentile(timings, p)) * 1000 for p in PERCENTILES}
+    stats.update({
+        'mean_ms': float(np.mean(timings)) * 1000,
+        'peak_mb': peak / 2**20,
+        'json_bytes': len(payload),
+        'json_ms': json_seconds * 1000,
+        'compact_bytes': len(compact),
+        'compact_ms': compact_seconds * 1000,
+        'compressed_bytes': len(brotli.compress(compact, quality=4)),
+    })
+    return stats
+
+
+def run_scale(repeat):
+    """Import app.py on the dataset in DASH_DATA_DIR and benchmark every case (runs in the child process)."""
+    import resource
+
+    start = time.perf_counter()
+    import app
+    startup = time.perf_counter() - start
+    # Let the tab layouts be prebuilt before timing anything, so they do not compete with the cases
+    app.tab_warmup.join()
+
+    results = {}
+    for name, case, args in benchmark_cases(app):
+        func = inspect.unwrap(getattr(app, name))
+        results[f"{name}[{case}]"] = measure(func, args, repeat)
+    return {
+        'rows': len(app.master_df),
+        'startup_s': startup,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'cases': results,
+    }
+
+
+def run_scales(scales, repeat, synthetic=False):
+    """Benchmark every scale in a fresh process and return the results."""
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.platform(),
+        },
+        'repeat': repeat,
+        'synthetic': synthetic,
+        'scales': {},
+    }
+    for scale in scales:
+        data_dir = scaled_dataset(scale, synthetic)
+        output = os.path.join(data_dir, 'results.json')
+        env = dict(
+            os.environ,
+            DASH_DATA_DIR=data_dir,
+            DASH_SHARED_DATASET='0',
+            DASH_METRICS='0',
+            FIGURE_CACHE_BACKEND='none',
+            INGEST_DIR=os.path.join(data_dir, 'no-ingest'),
+        )
+        print(f"Benchmarking {scale}x...", file=sys.stderr)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', output, '--repeat', str(repeat)], env=env, check=True)
+        with open(output) as f:
+            results['scales'][os.path.basename(data_dir)] = json.load(f)
+    return results
+
+
+def report(results, baseline=None, tolerance=0.25):
+    """Print the results, compared with the baseline if given; return the regressed cases."""
+    regressions = []
+    for scale, scale_results in results['scales'].items():
+        print(f"\n{scale}: {scale_results['rows']:,} rows, startup {scale_results['startup_s']:.1f}s, "
+              f"max RSS {scale_results['max_rss_mb']:.0f} MB")
+        print(f"{'case':<48}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'peak MB':>9}{'JSON KB':>9}{'sent KB':>9}{'vs base':>9}")
+        base_cases = (baseline or {}).get('scales', {}).get(scale, {}).get('cases', {})
+        for case, stats in scale_results['cases'].items():
+            change = ''
+            if case in base_cases:
+                ratio = stats['p50_ms'] / max(base_cases[case]['p50_ms'], 1e-6) - 1
+                change = f"{ratio:+.0%}"
+                if ratio > tolerance:
+                    regressions.append(f"{scale} {case}")
+            print(f"{case:<48}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                  f"{stats['peak_mb']:>9.1f}{stats['json_bytes'] / 1024:>9.1f}{stats['compressed_bytes'] / 1024:>9.1f}{change:>9}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=10, help="timed calls per case")
+    parser.add_argument('--synthetic', action='store_true', help="use synthetic_data.py datasets instead of resampling the CSV")
+    parser.add_argument('--save-baseline', action='store_true', help=f"save the results as the baseline ({BASELINE_PATH})")
+    parser.add_argument('--compare', action='store_true', help="exit with 1 if a case's p50 regressed beyond the tolerance")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p50 slowdown with --compare (default 0.25)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        scale_results = run_scale(options.repeat)
+        with open(options.child, 'w') as f:
+            json.dump(scale_results, f)
+        sys.exit()
+
+    results = run_scales(options.scales, options.repeat, options.synthetic)
+    with open(RESULTS_PATH, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, options.tolerance)
+
+    if options.save_baseline:
+        # Scales this run did not cover keep their previous baseline
+        saved = dict(results, scales=dict((baseline or {}).get('scales', {}), **results['scales']))
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(saved, f, indent=2)
+        print(f"\nSaved the baseline to {BASELINE_PATH}")
+    if options.compare and regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {options.tolerance:.0%}:")
+        print('\n'.join(regressions))
+        sys.exit(1)
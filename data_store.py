@@ -0,0 +1,580 @@
+"""Loading of the pre-processed master transfer data.
+
+The raw source is the gzip CSV. Parsing it (and deriving the extra columns the
+dashboard needs) is slow, so a build step can write a typed, columnar snapshot
+next to it:
+
+    python data_store.py            # add --shared to also build master_shared.bin,
+                                    # --memory to print the frame's memory use
+
+The snapshot stores the hash of the CSV it was built from; the loader only
+uses it when that hash still matches and falls back to the CSV otherwise.
+
+For multi-worker deployments the same columns can also be packed into one
+file that every worker memory-maps read-only (see build_shared_dataset).
+
+New transfers can be added without regenerating the CSV: append_delta adds
+the rows of a delta file to the snapshot (and the shared file), recording it
+in their 'deltas' list. See ingest.py. Each delta is written as a segment
+of its own next to the snapshot and merged in at load, so appending one does
+not rewrite the whole snapshot; the segments are folded into the snapshot
+once they hold SEGMENT_COMPACT_FRACTION of its rows.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Directory of the CSV and the files built from it; DASH_DATA_DIR points the app at
+# another copy of the data, e.g. the scaled datasets of benchmark.py
+DATA_DIR = os.environ.get('DASH_DATA_DIR', BASE_DIR)
+CSV_PATH = os.path.join(DATA_DIR, 'master_cleaned_reduced.csv.gz')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'master_snapshot.npz')
+SHARED_PATH = os.path.join(DATA_DIR, 'master_shared.bin')
+
+# When set, every worker maps the numeric and code columns of one shared file
+# (built by the gunicorn master, see gunicorn.conf.py) instead of holding its
+# own copy of master_df.
+SHARED_DATASET = os.environ.get('DASH_SHARED_DATASET') == '1'
+SHARED_ALIGN = 64
+
+# Delta segments are folded into the snapshot once they hold this fraction of its rows,
+# so each appended row is rewritten a bounded number of times
+SEGMENT_COMPACT_FRACTION = float(os.environ.get('SEGMENT_COMPACT_FRACTION', 0.25))
+
+# Bump whenever prepare_master_df or the snapshot layout changes, so old
+# snapshots are rebuilt instead of silently reused.
+SNAPSHOT_FORMAT = 3
+
+DATE_COLUMNS = ['transfer_date', 'date_of_birth']
+
+# Compact in-memory types of the prepared columns. Strings repeat a lot (a few hundred
+# clubs, a handful of positions) so they are categoricals. The age stays a float because
+# it is missing for players without a birth date, and fees stay float64 so sums are exact.
+COLUMN_TYPES = {
+    'club_name_from': 'category',
+    'club_name_to': 'category',
+    'league_name_to': 'category',
+    'player_name': 'category',
+    'country_of_citizenship': 'category',
+    'position': 'category',
+    'foot': 'category',
+    'transfer_year': 'int16',
+    'player_age': 'float32',
+}
+
+# Columns of the source CSV, which every delta file must have too
+SOURCE_COLUMNS = [
+    'transfer_date', 'club_name_from', 'club_name_to', 'league_name_to', 'transfer_fee',
+    'player_name', 'country_of_citizenship', 'date_of_birth', 'position', 'foot',
+]
+
+
+# Digests of the files hashed so far, by (path, mtime, size), so checking an unchanged
+# CSV (e.g. on every idle ingest poll) does not read it again
+_file_hashes = {}
+
+
+def file_hash(path):
+    """Return the sha256 hex digest of a file's contents, hashed once per process while it is unchanged."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def is_current(meta, csv_path=CSV_PATH):
+    """Return True if snapshot metadata was built from this CSV with the current format."""
+    return meta.get('format') == SNAPSHOT_FORMAT and meta.get('source_hash') == file_hash(csv_path)
+
+
+def dataset_version(source_hash, deltas=()):
+    """Return a short identifier of the data behind master_df (source CSV hash, preparation format and appended deltas)."""
+    version = f"{source_hash[:12]}-{SNAPSHOT_FORMAT}"
+    if deltas:
+        version += '-' + hashlib.sha256(''.join(d['hash'] for d in deltas).encode('utf-8')).hexdigest()[:8]
+    return version
+
+
+def apply_column_types(df):
+    """Convert the columns of a prepared frame to COLUMN_TYPES, in place, and return it."""
+    for name, dtype in COLUMN_TYPES.items():
+        if name in df.columns and str(df[name].dtype) != dtype:
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+def prepare_master_df(df):
+    """Add the derived columns used by the dashboard to a freshly read frame."""
+    df['transfer_year'] = df['transfer_date'].dt.year
+    df['player_age'] = df['transfer_date'].dt.year - df['date_of_birth'].dt.year
+
+    # Standardize league names for the destination club by replacing hyphens and applying title case
+    if 'league_name_to' in df.columns:
+        df['league_name_to'] = df['league_name_to'].str.replace('-', ' ').str.title()
+    else:
+        print("Warning: 'league_name_to' column not found in master_df.")
+
+    # Keep rows sorted by year so any year range is one contiguous block of rows (see aggregates.YearIndex)
+    return apply_column_types(df.sort_values('transfer_year', kind='stable', ignore_index=True))
+
+
+def read_master_csv(csv_path=CSV_PATH):
+    """Parse the gzip CSV and derive the dashboard columns."""
+    df = pd.read_csv(csv_path, parse_dates=DATE_COLUMNS, compression='gzip')
+    return prepare_master_df(df)
+
+
+def validate_delta(df):
+    """Raise ValueError unless df (a freshly read delta file) can be appended to master_df."""
+    missing = [c for c in SOURCE_COLUMNS if c not in df.columns]
+    extra = [c for c in df.columns if c not in SOURCE_COLUMNS]
+    if missing or extra:
+        raise ValueError(f"columns do not match the master data (missing {missing}, unexpected {extra})")
+    if df.empty:
+        raise ValueError("no rows")
+    for name in DATE_COLUMNS:
+        if not pd.api.types.is_datetime64_any_dtype(df[name]):
+            raise ValueError(f"{name} contains values that are not dates")
+    if df['transfer_date'].isna().any():
+        raise ValueError("transfer_date is missing on some rows")
+    if not pd.api.types.is_numeric_dtype(df['transfer_fee']):
+        raise ValueError("transfer_fee contains values that are not numbers")
+    if (df['transfer_fee'] < 0).any():
+        raise ValueError("transfer_fee contains negative fees")
+
+
+def read_delta(path):
+    """Parse and validate a delta file (CSV, optionally gzip) and derive the dashboard columns."""
+    df = pd.read_csv(path, parse_dates=DATE_COLUMNS)
+    validate_delta(df)
+    return prepare_master_df(df)
+
+
+def append_rows(df, delta):
+    """Return the prepared frame df followed by the prepared rows of delta, still sorted by year."""
+    # Categoricals with different categories concatenate to plain objects, hence apply_column_types
+    combined = pd.concat([df, delta], ignore_index=True)
+    return apply_column_types(combined.sort_values('transfer_year', kind='stable', ignore_index=True))
+
+
+def memory_report(df):
+    """Return a text table of df's memory use per column, with COLUMN_TYPES and with pandas' default types.
+
+    The default types are what a plain read_csv gives: object strings,
+    int64/float64 numbers, plus the three scaled copies of transfer_fee
+    (billions, millions, thousands) the frame used to carry.
+    """
+    widest = {'category': object, 'int16': 'int64', 'float32': 'float64'}
+    compact = df.memory_usage(deep=True, index=False)
+    default = df.astype({name: widest[dtype] for name, dtype in COLUMN_TYPES.items() if name in df.columns})
+    default = default.memory_usage(deep=True, index=False)
+    fee_copies = 3 * df['transfer_fee'].astype('float64').memory_usage(index=False)
+
+    lines = [f"{'column':<24}{'default':>12}{'compact':>12}"]
+    for name in df.columns:
+        lines.append(f"{name:<24}{default[name] / 1e6:>10.2f}MB{compact[name] / 1e6:>10.2f}MB")
+    lines.append(f"{'transfer_fee_b/m/t':<24}{fee_copies / 1e6:>10.2f}MB{0:>10.2f}MB")
+    lines.append(f"{'total':<24}{(default.sum() + fee_copies) / 1e6:>10.2f}MB{compact.sum() / 1e6:>10.2f}MB")
+    return '\n'.join(lines)
+
+
+def encode_columns(df):
+    """Return (columns, arrays): the typed column arrays of a prepared frame.
+
+    Dates become int64 nanoseconds, the year int16, string columns
+    categorical codes plus their dictionary of categories, and other numbers
+    keep their float width.
+    """
+    arrays = {}
+    columns = []
+    for name in df.columns:
+        col = df[name]
+        if name in DATE_COLUMNS:
+            kind = 'datetime'
+            arrays[name] = col.values.astype('datetime64[ns]').view('int64')
+        elif name == 'transfer_year':
+            kind = 'int'
+            arrays[name] = col.values.astype('int16')
+        elif col.dtype == object or isinstance(col.dtype, pd.CategoricalDtype):
+            kind = 'category'
+            cat = pd.Categorical(col)
+            arrays[name + '__codes'] = cat.codes
+            arrays[name + '__categories'] = np.array(cat.categories, dtype=str)
+        else:
+            kind = 'float'
+            arrays[name] = col.values.astype(col.dtype if col.dtype.kind == 'f' else 'float64')
+        columns.append({'name': name, 'kind': kind, 'dtype': str(col.dtype)})
+    return columns, arrays
+
+
+def build_snapshot(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH):
+    """Write a columnar snapshot of the prepared master data and return its schema."""
+    schema = write_snapshot(read_master_csv(csv_path), file_hash(csv_path), [], snapshot_path)
+    remove_segments(snapshot_path)
+    return schema
+
+
+def write_snapshot(df, source_hash, deltas, snapshot_path=SNAPSHOT_PATH):
+    """Write df as a snapshot built from the CSV with source_hash plus deltas, and return its schema."""
+    columns, arrays = encode_columns(df)
+
+    schema = {
+        'format': SNAPSHOT_FORMAT,
+        'source_hash': source_hash,
+        'rows': len(df),
+        'columns': columns,
+        'deltas': deltas,
+    }
+    arrays['__schema__'] = np.array(json.dumps(schema))
+
+    # Write to a temporary file first so a worker never sees a half-written snapshot
+    tmp_path = snapshot_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, snapshot_path)
+    return schema
+
+
+def read_snapshot(snapshot_path=SNAPSHOT_PATH):
+    """Return (schema, arrays) for a snapshot file."""
+    with np.load(snapshot_path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    schema = json.loads(str(arrays.pop('__schema__')))
+    return schema, arrays
+
+
+def read_snapshot_schema(snapshot_path=SNAPSHOT_PATH):
+    """Return the schema of a snapshot file without loading its columns."""
+    with np.load(snapshot_path, allow_pickle=False) as data:
+        return json.loads(str(data['__schema__']))
+
+
+def segment_dir(snapshot_path=SNAPSHOT_PATH):
+    """Return the directory holding the delta segments of a snapshot."""
+    return os.path.splitext(snapshot_path)[0] + '_deltas'
+
+
+def segment_paths(snapshot_path=SNAPSHOT_PATH):
+    """Return the paths of a snapshot's delta segments, oldest first."""
+    directory = segment_dir(snapshot_path)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.npz')]
+
+
+def is_segment_of(segment, schema):
+    """Return True if the segment with schema segment extends the snapshot with schema."""
+    # Segments left over from a snapshot of another CSV, or already folded into this one, are not
+    return segment['source_hash'] == schema['source_hash'] and segment['deltas'][0] not in schema['deltas']
+
+
+def read_segment_schemas(schema, snapshot_path=SNAPSHOT_PATH):
+    """Return the schemas of the delta segments that extend the snapshot with schema."""
+    segments = (read_snapshot_schema(path) for path in segment_paths(snapshot_path))
+    return [segment for segment in segments if is_segment_of(segment, schema)]
+
+
+def write_segment(delta, source_hash, delta_info, index, snapshot_path=SNAPSHOT_PATH):
+    """Write the prepared rows of one delta as segment number index of the snapshot."""
+    os.makedirs(segment_dir(snapshot_path), exist_ok=True)
+    return write_snapshot(delta, source_hash, [delta_info], os.path.join(segment_dir(snapshot_path), f"{index:06d}.npz"))
+
+
+def remove_segments(snapshot_path=SNAPSHOT_PATH):
+    """Delete the delta segments of a snapshot (after a rebuild or once folded into it)."""
+    for path in segment_paths(snapshot_path):
+        os.remove(path)
+
+
+def frame_from_snapshot(schema, arrays, shared=False):
+    """Rebuild the master frame from snapshot arrays.
+
+    By default the original dtypes are restored. With shared=True the arrays
+    are wrapped without copying, so a frame built on memory-mapped arrays
+    keeps pointing at the mapping.
+    """
+    data = {}
+    for col in schema['columns']:
+        name, kind = col['name'], col['kind']
+        if kind == 'category':
+            values = pd.Categorical.from_codes(arrays[name + '__codes'], arrays[name + '__categories'])
+        elif kind == 'datetime':
+            values = arrays[name].view('datetime64[ns]')
+        else:
+            values = arrays[name]
+        if shared:
+            data[name] = pd.Series(values, copy=False)
+        else:
+            data[name] = pd.Series(values).astype(col['dtype'])
+    return pd.DataFrame(data, copy=False)
+
+
+def build_shared_dataset(shared_path=SHARED_PATH, csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH):
+    """Pack the master data into a single file that workers map read-only.
+
+    Layout: an 8-byte little-endian header length, the JSON header, the
+    numeric and categorical-code column arrays (each 64-byte aligned) and
+    finally the JSON string dictionaries of the categorical columns.
+    """
+    df, deltas, source_hash = load_master(csv_path, snapshot_path, shared=False)
+    columns, arrays = encode_columns(df)
+
+    dictionaries = {}
+    blocks = []
+    for key, values in arrays.items():
+        if key.endswith('__categories'):
+            dictionaries[key[:-len('__categories')]] = values.tolist()
+        else:
+            blocks.append((key, np.ascontiguousarray(values)))
+
+    # Offsets are relative to the start of the data section
+    layout = {}
+    offset = 0
+    for key, values in blocks:
+        layout[key] = {'dtype': values.dtype.str, 'offset': offset, 'length': len(values)}
+        offset += -(-values.nbytes // SHARED_ALIGN) * SHARED_ALIGN
+    dictionaries_bytes = json.dumps(dictionaries).encode('utf-8')
+
+    header = json.dumps({
+        'format': SNAPSHOT_FORMAT,
+        'source_hash': source_hash,
+        'rows': len(df),
+        'columns': columns,
+        'layout': layout,
+        'dictionaries': {'offset': offset, 'length': len(dictionaries_bytes)},
+        'deltas': deltas,
+    }).encode('utf-8')
+    data_start = -(-(8 + len(header)) // SHARED_ALIGN) * SHARED_ALIGN
+
+    tmp_path = shared_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for key, values in blocks:
+            f.seek(data_start + layout[key]['offset'])
+            f.write(values.tobytes())
+        f.seek(data_start + offset)
+        f.write(dictionaries_bytes)
+    os.replace(tmp_path, shared_path)
+
+
+def append_to_shared_dataset(delta, deltas, shared_path=SHARED_PATH):
+    """Rewrite the shared dataset file with the prepared rows of delta merged in.
+
+    The rows go where append_rows puts them, after the rows of their year,
+    at positions found by a binary search of the mapped year column. The file
+    is rewritten one column at a time from the mapping, so neither the frame
+    nor the CSV is loaded; categorical codes are remapped to the sorted union
+    of the old and new categories. deltas is the new list of deltas.
+    """
+    header, data_start = read_shared_header(shared_path)
+    buf = np.memmap(shared_path, dtype=np.uint8, mode='r')
+
+    def mapped(key):
+        info = header['layout'][key]
+        dtype = np.dtype(info['dtype'])
+        start = data_start + info['offset']
+        return buf[start:start + info['length'] * dtype.itemsize].view(dtype)
+
+    start = data_start + header['dictionaries']['offset']
+    old_dictionaries = json.loads(buf[start:start + header['dictionaries']['length']].tobytes().decode('utf-8'))
+    _, delta_arrays = encode_columns(delta)
+    positions = np.searchsorted(mapped('transfer_year'), delta_arrays['transfer_year'], side='right')
+    rows = header['rows'] + len(delta)
+
+    # Merged dictionaries first: they fix the width of the code columns, hence the layout
+    dictionaries = {}
+    code_dtypes = {}
+    for name, categories in old_dictionaries.items():
+        merged = pd.Index(categories).union(pd.Index(delta_arrays[name + '__categories'].tolist()))
+        dictionaries[name] = merged.tolist()
+        code_dtypes[name + '__codes'] = pd.Categorical.from_codes([], merged).codes.dtype
+
+    layout = {}
+    offset = 0
+    for key, info in header['layout'].items():
+        dtype = code_dtypes.get(key, np.dtype(info['dtype']))
+        layout[key] = {'dtype': dtype.str, 'offset': offset, 'length': rows}
+        offset += -(-rows * dtype.itemsize // SHARED_ALIGN) * SHARED_ALIGN
+    dictionaries_bytes = json.dumps(dictionaries).encode('utf-8')
+
+    new_header = json.dumps(dict(
+        header, rows=rows, layout=layout, dictionaries={'offset': offset, 'length': len(dictionaries_bytes)}, deltas=deltas,
+    )).encode('utf-8')
+    new_start = -(-(8 + len(new_header)) // SHARED_ALIGN) * SHARED_ALIGN
+
+    tmp_path = shared_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(len(new_header).to_bytes(8, 'little'))
+        f.write(new_header)
+        for key in layout:
+            old, new = mapped(key), delta_arrays[key]
+            if key in code_dtypes:
+                # Translate old and delta codes into the merged dictionary, keeping -1 (missing)
+                name = key[:-len('__codes')]
+                merged = pd.Index(dictionaries[name])
+                old_map = np.append(merged.get_indexer(old_dictionaries[name]), -1)
+                new_map = np.append(merged.get_indexer(delta_arrays[name + '__categories'].tolist()), -1)
+                old, new = old_map[old], new_map[new]
+            values = np.insert(old, positions, new).astype(layout[key]['dtype'], copy=False)
+            f.seek(new_start + layout[key]['offset'])
+            f.write(values.tobytes())
+        f.seek(new_start + offset)
+        f.write(dictionaries_bytes)
+    del buf
+    os.replace(tmp_path, shared_path)
+
+
+def read_shared_header(shared_path=SHARED_PATH):
+    """Return (header, data_start) of a shared dataset file."""
+    with open(shared_path, 'rb') as f:
+        size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(size).decode('utf-8'))
+    return header, -(-(8 + size) // SHARED_ALIGN) * SHARED_ALIGN
+
+
+def snapshot_deltas(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH):
+    """Return the deltas appended to the snapshot, or [] when there is no current snapshot."""
+    try:
+        schema = read_snapshot_schema(snapshot_path)
+        if not is_current(schema, csv_path):
+            return []
+        segments = read_segment_schemas(schema, snapshot_path)
+    except (OSError, ValueError, KeyError):
+        return []
+    return schema.get('deltas', []) + [segment['deltas'][0] for segment in segments]
+
+
+def ensure_shared_dataset(shared_path=SHARED_PATH, csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH):
+    """(Re)build the shared dataset file unless it already matches the CSV and the snapshot's deltas."""
+    if os.path.exists(shared_path):
+        header, _ = read_shared_header(shared_path)
+        if is_current(header, csv_path) and header.get('deltas', []) == snapshot_deltas(csv_path, snapshot_path):
+            return
+    build_shared_dataset(shared_path, csv_path, snapshot_path)
+
+
+def map_shared_master_df(shared_path=SHARED_PATH):
+    """Build the master frame on top of a read-only memory mapping of the shared file.
+
+    Only the string dictionaries are read into this process; every numeric
+    and code column stays backed by the page cache shared with other workers.
+    The dictionaries are read eagerly rather than on first use: pandas needs
+    a categorical's categories to build the column, and the app reads every
+    string column at import anyway (filters, nationality map, player race).
+    They cost each worker about 0.7 MB here, mostly the player names, and
+    grow with the number of distinct names rather than with the rows.
+    """
+    header, data_start = read_shared_header(shared_path)
+    buf = np.memmap(shared_path, dtype=np.uint8, mode='r')
+
+    arrays = {}
+    for key, info in header['layout'].items():
+        dtype = np.dtype(info['dtype'])
+        start = data_start + info['offset']
+        arrays[key] = buf[start:start + info['length'] * dtype.itemsize].view(dtype)
+
+    start = data_start + header['dictionaries']['offset']
+    raw = buf[start:start + header['dictionaries']['length']].tobytes()
+    for name, categories in json.loads(raw.decode('utf-8')).items():
+        arrays[name + '__categories'] = np.array(categories, dtype=object)
+
+    return header, frame_from_snapshot(header, arrays, shared=True)
+
+
+def load_master(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH, shared=SHARED_DATASET, shared_path=SHARED_PATH):
+    """Load the master frame and return (frame, deltas appended to it, hash of the source CSV).
+
+    In shared mode the frame is mapped from the shared dataset file when it
+    matches the CSV. Otherwise the snapshot is used when it matches the CSV,
+    and the CSV itself (without any deltas) as a last resort. The hash is
+    the one stored with the snapshot or shared file, so it serves as the
+    dataset version (see dataset_version) without hashing the CSV again.
+    """
+    if shared and os.path.exists(shared_path):
+        header, _ = read_shared_header(shared_path)
+        if is_current(header, csv_path):
+            return map_shared_master_df(shared_path)[1], header.get('deltas', []), header['source_hash']
+        print(f"Warning: shared dataset {shared_path} is stale, loading privately instead.")
+    elif shared:
+        print(f"Warning: shared dataset {shared_path} not found, loading privately instead.")
+
+    if os.path.exists(snapshot_path):
+        try:
+            schema, arrays = read_snapshot(snapshot_path)
+            segments = [read_snapshot(path) for path in segment_paths(snapshot_path)]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: could not read snapshot {snapshot_path}: {e}")
+        else:
+            if is_current(schema, csv_path):
+                df, deltas = frame_from_snapshot(schema, arrays), schema.get('deltas', [])
+                for segment_schema, segment_arrays in segments:
+                    if is_segment_of(segment_schema, schema):
+                        df = append_rows(df, frame_from_snapshot(segment_schema, segment_arrays))
+                        deltas = deltas + segment_schema['deltas']
+                return df, deltas, schema['source_hash']
+            print(f"Warning: snapshot {snapshot_path} is stale, reading {csv_path} instead.")
+    return read_master_csv(csv_path), [], file_hash(csv_path)
+
+
+def load_master_df(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH, shared=SHARED_DATASET, shared_path=SHARED_PATH):
+    """Load the master frame (see load_master)."""
+    return load_master(csv_path, snapshot_path, shared, shared_path)[0]
+
+
+def append_delta(delta, delta_info, csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH, shared_path=SHARED_PATH):
+    """Append a prepared delta to the stored master data and return the new list of deltas.
+
+    delta_info ({'name': ..., 'hash': ...}) is recorded with the rows. They
+    are written as a new segment of the snapshot, and the segments are folded
+    into the snapshot once they hold SEGMENT_COMPACT_FRACTION of its rows, so
+    the cost of an append grows with the delta rather than with the data.
+    The shared file, when there is one, gets the rows merged in column by
+    column (see append_to_shared_dataset). All files are written atomically.
+    """
+    try:
+        schema = read_snapshot_schema(snapshot_path)
+        current = is_current(schema, csv_path)
+    except (OSError, ValueError, KeyError):
+        current = False
+    if current:
+        segments = read_segment_schemas(schema, snapshot_path)
+        deltas = schema['deltas'] + [segment['deltas'][0] for segment in segments] + [delta_info]
+        write_segment(delta, schema['source_hash'], delta_info, len(deltas), snapshot_path)
+        if sum(segment['rows'] for segment in segments) + len(delta) > SEGMENT_COMPACT_FRACTION * schema['rows']:
+            df, _, _ = load_master(csv_path, snapshot_path, shared=False)
+            write_snapshot(df, schema['source_hash'], deltas, snapshot_path)
+            remove_segments(snapshot_path)
+    else:
+        # No usable snapshot: write one of the CSV and this delta
+        df, deltas, source_hash = load_master(csv_path, snapshot_path, shared=False)
+        deltas = deltas + [delta_info]
+        write_snapshot(append_rows(df, delta), source_hash, deltas, snapshot_path)
+        remove_segments(snapshot_path)
+
+    if os.path.exists(shared_path):
+        header, _ = read_shared_header(shared_path)
+        if is_current(header, csv_path) and header.get('deltas', []) == deltas[:-1]:
+            append_to_shared_dataset(delta, deltas, shared_path)
+        else:
+            build_shared_dataset(shared_path, csv_path, snapshot_path)
+    return deltas
+
+if __name__ == '__main__':
+    schema = build_snapshot()
+    print(f"Wrote {SNAPSHOT_PATH} ({schema['rows']} rows, source {schema['source_hash'][:12]})")
+    if '--memory' in sys.argv[1:]:
+        print(memory_report(load_master_df(shared=False)))
+    if '--shared' in sys.argv[1:]:
+        build_shared_dataset()
+        print(f"Wrote {SHARED_PATH}")
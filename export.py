@@ -0,0 +1,146 @@
+"""Download of the transfers behind the dashboard, with the same filters as its tabs.
+
+    /export.csv?years=2014-2024&leagues=Premier League&leagues=Laliga
+    /export.parquet?years=2018-2020&ages=18-23&positions=Midfield&feet=left
+
+Every filter is optional: years and ages are inclusive ranges ('first-last'),
+leagues, clubs (destination club), positions and feet are repeated
+parameters, ORed within a filter; filters are ANDed. Values are those of
+the data, which are also the values of the dashboard's inputs.
+
+The response is streamed. The rows of the year range are a zero-copy slice of
+master_df, which is read EXPORT_CHUNK_ROWS rows at a time: each chunk is
+filtered and written out on its own, so neither the filtered rows nor a copy
+of master_df are ever held in memory, whatever the size of the export.
+Parquet needs pyarrow, which is only imported for Parquet exports; each chunk
+becomes a row group.
+"""
+import os
+
+import flask
+import numpy as np
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 20000))
+EXPORT_PATH = '/export.<fmt>'
+
+# Query parameter of each label filter, and the column it applies to
+MEMBER_FILTERS = {
+    'leagues': 'league_name_to',
+    'clubs': 'club_name_to',
+    'positions': 'position',
+    'feet': 'foot',
+}
+
+
+def parse_range(text, name, cast):
+    """Return the inclusive (first, last) of a 'first-last' parameter."""
+    try:
+        first, last = (cast(part) for part in text.split('-'))
+    except ValueError:
+        flask.abort(400, f"{name} must be a range like 2014-2024")
+    return first, last
+
+
+def parse_filters(args):
+    """Return (year range or None, filters) from the request's query parameters."""
+    years = parse_range(args['years'], 'years', int) if 'years' in args else None
+    filters = {column: args.getlist(name) for name, column in MEMBER_FILTERS.items() if name in args}
+    if 'ages' in args:
+        filters['player_age'] = parse_range(args['ages'], 'ages', float)
+    return years, filters
+
+
+def matching(chunk, filters):
+    """Return the rows of a chunk passing every filter."""
+    keep = np.ones(len(chunk), dtype=bool)
+    for column, wanted in filters.items():
+        values = chunk[column]
+        if column == 'player_age':
+            keep &= ((values >= wanted[0]) & (values <= wanted[1])).values
+        else:
+            keep &= values.isin(wanted).values
+    return chunk[keep]
+
+
+def chunks(rows, filters):
+    """Yield the filtered rows EXPORT_CHUNK_ROWS source rows at a time."""
+    for start in range(0, max(len(rows), 1), EXPORT_CHUNK_ROWS):
+        yield matching(rows.iloc[start:start + EXPORT_CHUNK_ROWS], filters)
+
+
+def csv_stream(rows, filters):
+    """Yield the CSV text of the filtered rows, chunk by chunk."""
+    for i, chunk in enumerate(chunks(rows, filters)):
+        yield chunk.to_csv(index=False, header=(i == 0))
+
+
+class StreamSink:
+    """Write-only file handing the bytes written so far to a generator (see parquet_stream)."""
+
+    def __init__(self):
+        self.buffers = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffers.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.buffers = b''.join(self.buffers), []
+        return data
+
+
+def parquet_stream(rows, filters):
+    """Yield a Parquet file of the filtered rows, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = StreamSink()
+    writer = None
+    for chunk in chunks(rows, filters):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), table.schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def install_export(server, rows_in_years):
+    """Serve /export.csv and /export.parquet on the Flask server.
+
+    rows_in_years(year_range) returns the rows of the current dataset in a
+    year range (all of them for None). It is called once per export, so an
+    export keeps streaming from the dataset it started on if new transfers
+    are swapped in meanwhile.
+    """
+    @server.route(EXPORT_PATH)
+    def export(fmt):
+        if fmt not in ('csv', 'parquet'):
+            flask.abort(404)
+        years, filters = parse_filters(flask.request.args)
+        rows = rows_in_years(years)
+
+        if fmt == 'csv':
+            stream, mimetype = csv_stream(rows, filters), 'text/csv'
+        else:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                flask.abort(501, "Parquet export needs pyarrow; use /export.csv")
+            stream, mimetype = parquet_stream(rows, filters), 'application/vnd.apache.parquet'
+        return flask.Response(stream, mimetype=mimetype, headers={
+            'Content-Disposition': f"attachment; filename=transfers.{fmt}",
+        })
@@ -0,0 +1,38 @@
+"""Scaling and formatting of transfer fees for charts and hover labels."""
+import numpy as np
+import pandas as pd
+
+# (threshold, divisor, suffix), largest first
+FEE_UNITS = [(1e9, 1e9, 'B'), (1e6, 1e6, 'M'), (1e3, 1e3, 'K')]
+
+
+def fee_scale(max_fee):
+    """Return (divisor, axis suffix) for a chart whose largest fee is max_fee.
+
+    Billions, millions, thousands, or raw fees (divisor 1) when max_fee is
+    below 1000, zero or missing.
+    """
+    for threshold, divisor, suffix in FEE_UNITS:
+        if max_fee >= threshold:
+            return divisor, f"({suffix})"
+    return 1.0, ''
+
+
+def format_fee(fee):
+    """Return a fee as a string with its own suffix (B, M, K), e.g. 1.25B, 80.00M, 500.00K."""
+    for threshold, divisor, suffix in FEE_UNITS:
+        if fee >= threshold:
+            return f"{fee / divisor:.2f}{suffix}"
+    return f"{fee:.2f}"
+
+
+def format_fees(values):
+    """Return an object array with the format_fee string of every value.
+
+    Fees repeat a lot (round amounts, the same fee on many rows), so each
+    distinct fee is formatted once and the strings are spread back to the
+    rows by their factorize codes. Missing fees give 'nan'.
+    """
+    codes, distinct = pd.factorize(np.asarray(values, dtype=float))
+    labels = np.array([format_fee(fee) for fee in distinct.tolist()] + ['nan'], dtype=object)
+    return labels[codes]
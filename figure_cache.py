@@ -0,0 +1,307 @@
+"""Memoization of the figures returned by the dashboard callbacks.
+
+Figures are cached in two tiers: a per-process LRU of figure objects and an
+optional store shared by all workers (a directory on local disk, or a Redis
+server) holding their serialized JSON.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from plotly.utils import PlotlyJSONEncoder
+
+
+def canonical_args(args):
+    """Normalise callback inputs so equivalent selections share one cache key.
+
+    Lists of labels (positions, feet, leagues, clubs) are order- and
+    duplicate-insensitive filters, so they become sorted tuples. Any other
+    list (a slider range) keeps its order.
+    """
+    key = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            if all(isinstance(v, str) for v in arg):
+                key.append(tuple(sorted(set(arg))))
+            else:
+                key.append(tuple(arg))
+        else:
+            key.append(arg)
+    return tuple(key)
+
+
+def source_fingerprint(directory):
+    """Return a short digest of the Python sources in directory.
+
+    Part of the shared cache version, so figures written by a previous
+    deploy of the code are never served by the new one.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(name.encode('utf-8'))
+                digest.update(f.read())
+    return digest.hexdigest()[:8]
+
+
+def store_key(key):
+    """Return a stable digest of a cache key, identical in every process."""
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+
+
+class DiskFigureStore:
+    """Serialized figures stored as files under directory/<dataset version>/.
+
+    Entries older than ttl seconds are treated as missing, and once the
+    directory grows past max_bytes the oldest files are removed, whatever
+    their version: workers of a rolling deploy, or not yet on the latest
+    delta, may still be using another version's directory.
+    """
+
+    # Only rescan the directory for the size cap every so many writes
+    PRUNE_EVERY = 16
+
+    def __init__(self, directory, ttl=3600, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.version = None
+        self._writes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, str(self.version), store_key(key) + '.json')
+
+    def set_version(self, version):
+        """Switch to a dataset version; other versions' entries are left to prune()."""
+        self.version = version
+        os.makedirs(os.path.join(self.directory, str(version)), exist_ok=True)
+        self.prune()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, payload):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            # prune() may have removed the directory while it was empty
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired files, then the oldest ones until the store fits in max_bytes.
+
+        Version directories left empty, other than the current one, are removed too.
+        """
+        entries = []
+        directories = []
+        for root, _, files in os.walk(self.directory):
+            if root != self.directory:
+                directories.append(root)
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+        current = os.path.join(self.directory, str(self.version))
+        for path in directories:
+            if path != current:
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    pass  # not empty
+
+
+class RedisFigureStore:
+    """Serialized figures stored in a Redis-protocol server under prefix:<version>:<digest>.
+
+    Any client with get/set(ex=) works, e.g. redis.Redis or a local
+    stand-in. Entries of every version expire after ttl seconds; single
+    figures larger than max_item_bytes are not stored, the overall cap being
+    the server's maxmemory policy.
+    """
+
+    def __init__(self, client, prefix='figures', ttl=3600, max_item_bytes=8 * 1024 * 1024):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_item_bytes = max_item_bytes
+        self.version = None
+
+    def _key(self, key):
+        return f"{self.prefix}:{self.version}:{store_key(key)}"
+
+    def set_version(self, version):
+        """Switch to a dataset version; other versions' entries are left to expire."""
+        self.version = version
+
+    def get(self, key):
+        try:
+            return self.client.get(self._key(key))
+        except Exception:
+            return None
+
+    def set(self, key, payload):
+        if len(payload) > self.max_item_bytes:
+            return
+        try:
+            self.client.set(self._key(key), payload, ex=self.ttl)
+        except Exception:
+            pass
+
+
+def shared_store_from_env(base_dir):
+    """Build the shared figure store selected by the FIGURE_CACHE_* environment variables.
+
+    FIGURE_CACHE_BACKEND is 'disk' (default, under FIGURE_CACHE_DIR),
+    'redis' (FIGURE_CACHE_URL) or 'none'.
+    """
+    backend = os.environ.get('FIGURE_CACHE_BACKEND', 'disk')
+    ttl = int(os.environ.get('FIGURE_CACHE_TTL', 3600))
+    if backend == 'disk':
+        directory = os.environ.get('FIGURE_CACHE_DIR', os.path.join(base_dir, '.figure_cache'))
+        max_bytes = int(os.environ.get('FIGURE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        return DiskFigureStore(directory, ttl=ttl, max_bytes=max_bytes)
+    if backend == 'redis':
+        import redis
+        client = redis.Redis.from_url(os.environ.get('FIGURE_CACHE_URL', 'redis://localhost:6379/0'))
+        return RedisFigureStore(client, ttl=ttl)
+    return None
+
+
+class FigureCache:
+    """Bounded LRU cache of callback figures keyed on (callback, dataset version, inputs).
+
+    When a shared store is given, local misses are looked up there (as JSON)
+    before the callback runs, and freshly built figures are written to it.
+    """
+
+    def __init__(self, maxsize=256, version=None, shared=None):
+        self.maxsize = maxsize
+        self.hits = Counter()
+        self.shared_hits = Counter()
+        self.misses = Counter()
+        # Called as on_lookup(callback name, 'hit' | 'shared_hit' | 'miss'), e.g. by metrics.install_metrics
+        self.on_lookup = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.shared = shared
+        self.set_version(version)
+
+    def set_version(self, version):
+        """Switch to a new dataset version, dropping every cached figure."""
+        self.version = version
+        self.clear()
+        if self.shared is not None:
+            try:
+                self.shared.set_version(version)
+            except OSError as e:
+                print(f"Warning: shared figure cache disabled: {e}")
+                self.shared = None
+
+    def get(self, key):
+        """Return the cached value for key (marking it recently used), or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries beyond maxsize."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Return the size and the per-callback hit/miss counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': dict(self.hits),
+                'shared_hits': dict(self.shared_hits),
+                'misses': dict(self.misses),
+            }
+
+    def _count(self, counter, name, result):
+        counter[name] += 1
+        if self.on_lookup is not None:
+            self.on_lookup(name, result)
+
+    def memoize(self, func):
+        """Decorator caching func's return value for each canonicalised set of inputs."""
+        @functools.wraps(func)
+        def wrapper(*args):
+            if self.maxsize <= 0 and self.shared is None:
+                return func(*args)
+            try:
+                key = (func.__name__, self.version, canonical_args(args))
+                hash(key)
+            except TypeError:
+                # Inputs we cannot hash (e.g. nested lists) are simply not cached
+                return func(*args)
+
+            value = self.get(key)
+            if value is not None:
+                self._count(self.hits, func.__name__, 'hit')
+                return value
+
+            if self.shared is not None:
+                payload = self.shared.get(key)
+                if payload is not None:
+                    self._count(self.shared_hits, func.__name__, 'shared_hit')
+                    value = json.loads(payload)
+                    self.put(key, value)
+                    return value
+
+            self._count(self.misses, func.__name__, 'miss')
+            value = func(*args)
+            self.put(key, value)
+            if self.shared is not None:
+                self.shared.set(key, json.dumps(value, cls=PlotlyJSONEncoder).encode('utf-8'))
+            return value
+        return wrapper
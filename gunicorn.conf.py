@@ -0,0 +1,21 @@
+"""Gunicorn settings for serving the dashboard with a shared dataset.
+
+    gunicorn app:server
+
+The master builds master_shared.bin once before forking, and every worker
+memory-maps it read-only instead of loading its own copy of master_df.
+"""
+import os
+
+os.environ.setdefault('DASH_SHARED_DATASET', '1')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# Threaded workers, so the requests a slider drag sends pile up in one process, where
+# request_guard drops all but the latest instead of computing each in turn
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def on_starting(server):
+    # Runs once in the master, before any worker imports app.py
+    import data_store
+    data_store.ensure_shared_dataset()
@@ -0,0 +1,179 @@
+"""Live ingestion of delta files: new transfers added to the running dashboard.
+
+Drop a CSV (optionally .csv.gz) with the columns of the master CSV into the
+ingest directory (INGEST_DIR, default ./ingest). Only finished files are
+picked up: write the file under a name starting with '.' or ending in .tmp
+and rename it into place, or leave it unmodified for INGEST_SETTLE seconds
+(default INGEST_INTERVAL) before it is considered complete. A watcher thread
+in every worker then, every INGEST_INTERVAL seconds:
+
+1. under a file lock, so only one process does it, validates each new file,
+   appends it to the snapshot (see data_store.append_delta) and moves it to
+   ingest/applied/, or to ingest/rejected/ with a .error note explaining why;
+2. hands the deltas the store has but the worker has not applied yet to the
+   app, which updates its aggregates incrementally and swaps them in.
+"""
+import contextlib
+import fcntl
+import functools
+import os
+import shutil
+import threading
+import time
+
+from data_store import BASE_DIR, CSV_PATH, SNAPSHOT_PATH, file_hash, read_delta, snapshot_deltas, append_delta
+
+INGEST_DIR = os.environ.get('INGEST_DIR', os.path.join(BASE_DIR, 'ingest'))
+INGEST_INTERVAL = float(os.environ.get('INGEST_INTERVAL', 30))
+# Seconds a delta file must go unmodified before it is read, so one still being written is left alone
+INGEST_SETTLE = float(os.environ.get('INGEST_SETTLE', INGEST_INTERVAL))
+DELTA_SUFFIXES = ('.csv', '.csv.gz')
+
+
+class SwapLock:
+    """Readers-writer lock letting a dataset swap wait for the callbacks reading the old one.
+
+    Callbacks wrapped with reading() run concurrently; swapping() waits for
+    the running ones to finish and holds new ones back until it is done.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._swapping = False
+
+    def reading(self, func):
+        """Decorator running func as a reader."""
+        @functools.wraps(func)
+        def wrapper(*args):
+            with self._cond:
+                while self._swapping:
+                    self._cond.wait()
+                self._readers += 1
+            try:
+                return func(*args)
+            finally:
+                with self._cond:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+        return wrapper
+
+    @contextlib.contextmanager
+    def swapping(self):
+        """Context in which no reader runs."""
+        with self._cond:
+            while self._swapping:
+                self._cond.wait()
+            self._swapping = True
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._swapping = False
+                self._cond.notify_all()
+
+
+@contextlib.contextmanager
+def ingest_lock(ingest_dir=INGEST_DIR):
+    """Exclusive lock over the ingest directory, shared by all processes on the host."""
+    with open(os.path.join(ingest_dir, '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def reject(path, reason, ingest_dir=INGEST_DIR):
+    """Move a delta file to ingest/rejected/ next to a note with the reason."""
+    rejected_dir = os.path.join(ingest_dir, 'rejected')
+    os.makedirs(rejected_dir, exist_ok=True)
+    target = os.path.join(rejected_dir, os.path.basename(path))
+    shutil.move(path, target)
+    with open(target + '.error', 'w') as f:
+        f.write(f"{reason}\n")
+    print(f"Warning: rejected delta {os.path.basename(path)}: {reason}")
+
+
+def is_finished(path, settle=INGEST_SETTLE):
+    """Return True if a file in the ingest directory is a delta that is no longer being written.
+
+    Dotfiles and names not ending in a delta suffix (such as .csv.tmp) are
+    files still being written, as is a file modified less than settle seconds ago.
+    """
+    name = os.path.basename(path)
+    if name.startswith('.') or not name.endswith(DELTA_SUFFIXES) or not os.path.isfile(path):
+        return False
+    return time.time() - os.path.getmtime(path) >= settle
+
+
+def ingest_pending(ingest_dir=INGEST_DIR, csv_path=CSV_PATH, snapshot_path=SNAPSHOT_PATH, settle=INGEST_SETTLE):
+    """Append every new, finished delta file in ingest_dir to the store; return the store's list of deltas.
+
+    Must be called with ingest_lock held.
+    """
+    applied_dir = os.path.join(ingest_dir, 'applied')
+    os.makedirs(applied_dir, exist_ok=True)
+    deltas = snapshot_deltas(csv_path, snapshot_path)
+
+    for name in sorted(os.listdir(ingest_dir)):
+        path = os.path.join(ingest_dir, name)
+        if not is_finished(path, settle):
+            continue
+        digest = file_hash(path)
+        if any(d['hash'] == digest for d in deltas):
+            reject(path, "already ingested", ingest_dir)
+            continue
+        if os.path.exists(os.path.join(applied_dir, name)):
+            reject(path, f"a different file named {name} was already ingested", ingest_dir)
+            continue
+        try:
+            delta = read_delta(path)
+        except Exception as e:  # anything pandas raises on a malformed file
+            reject(path, e, ingest_dir)
+            continue
+
+        deltas = append_delta(delta, {'name': name, 'hash': digest, 'rows': len(delta)}, csv_path, snapshot_path)
+        shutil.move(path, os.path.join(applied_dir, name))
+        print(f"Ingested delta {name} ({len(delta)} rows)")
+    return deltas
+
+
+class DeltaWatcher(threading.Thread):
+    """Background thread feeding newly ingested deltas to on_deltas(frames, deltas).
+
+    applied is the list of deltas the running app already contains. on_deltas
+    gets the prepared frames of the missing ones, in order, and the store's
+    full list of deltas.
+    """
+
+    def __init__(self, applied, on_deltas, ingest_dir=INGEST_DIR, interval=INGEST_INTERVAL):
+        super().__init__(name='delta-watcher', daemon=True)
+        self.applied = list(applied)
+        self.on_deltas = on_deltas
+        self.ingest_dir = ingest_dir
+        self.interval = interval
+
+    def poll(self):
+        """Ingest pending files and apply the deltas this process is missing."""
+        with ingest_lock(self.ingest_dir):
+            deltas = ingest_pending(self.ingest_dir)
+            if deltas[:len(self.applied)] != self.applied:
+                # The CSV itself was regenerated: its deltas are part of it now, a restart picks it up
+                return
+            missing = deltas[len(self.applied):]
+            frames = [read_delta(os.path.join(self.ingest_dir, 'applied', d['name'])) for d in missing]
+        if frames:
+            self.on_deltas(frames, deltas)
+            self.applied = deltas
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:  # keep serving the current data whatever happens
+                print(f"Warning: delta ingestion failed: {e}")
+            time.sleep(self.interval)
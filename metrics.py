@@ -0,0 +1,147 @@
+"""Optional Prometheus instrumentation of the dashboard callbacks.
+
+With DASH_METRICS=1 every instrumented callback records, on /metrics:
+
+- its wall time per phase: 'filter', 'aggregate' and 'encode' (the helpers
+  marked with timed()), 'figure' (the rest of a computed callback, i.e.
+  building the figure) and 'serialize' (from the callback's return to the end
+  of the request, i.e. Dash encoding the response as JSON and its compression);
+- the raw rows, and separately the fee cube cells, left after its filters;
+- the size of its response body, and the bytes sent once compressed;
+- its figure cache hits and misses.
+
+Without it instrument() and timed() return the functions unchanged and
+install_metrics() does nothing, so nothing is measured and prometheus_client
+is not even imported.
+
+Under gunicorn, point PROMETHEUS_MULTIPROC_DIR at an empty directory before
+starting it, so /metrics adds up the samples of every worker.
+"""
+import functools
+import os
+import threading
+import time
+
+import flask
+
+METRICS_ENABLED = os.environ.get('DASH_METRICS') == '1'
+METRICS_PATH = '/metrics'
+
+# The callback running in this thread, and what its timed helpers recorded so far
+_current = threading.local()
+
+if METRICS_ENABLED:
+    import prometheus_client
+    from prometheus_client import multiprocess
+
+    PHASE_SECONDS = prometheus_client.Histogram(
+        'dash_callback_phase_seconds', 'Wall time of a callback phase', ['callback', 'phase']
+    )
+    CALLBACK_SECONDS = prometheus_client.Histogram(
+        'dash_callback_seconds', 'Wall time of a callback, figure cache lookups included', ['callback']
+    )
+    FILTERED_ROWS = prometheus_client.Histogram(
+        'dash_callback_filtered_rows', 'Rows of master_df left after filtering', ['callback'],
+        buckets=(10, 100, 1000, 10000, 100000, 1000000, 10000000)
+    )
+    FILTERED_CELLS = prometheus_client.Histogram(
+        'dash_callback_filtered_cells', 'Fee cube cells left after filtering', ['callback'],
+        buckets=(10, 100, 1000, 10000, 100000, 1000000, 10000000)
+    )
+    RESPONSE_BYTES = prometheus_client.Histogram(
+        'dash_callback_response_bytes', 'Size of the callback response body', ['callback'],
+        buckets=(1000, 10000, 100000, 300000, 1000000, 3000000, 10000000)
+    )
+    SENT_BYTES = prometheus_client.Histogram(
+        'dash_callback_sent_bytes', 'Size of the callback response as sent, by content encoding', ['callback', 'encoding'],
+        buckets=(1000, 10000, 100000, 300000, 1000000, 3000000, 10000000)
+    )
+    CACHE_LOOKUPS = prometheus_client.Counter(
+        'dash_figure_cache_lookups', 'Figure cache lookups by result (hit, shared_hit, miss)', ['callback', 'result']
+    )
+
+
+def timed(phase, rows=False, cells=False):
+    """Decorator recording func's wall time as `phase` of the callback calling it.
+
+    With rows=True the length of func's result is counted as filtered rows,
+    with cells=True as filtered fee cube cells; the two are reported apart.
+    Calls made outside an instrumented callback are not recorded.
+    """
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            callback = getattr(_current, 'callback', None)
+            if callback is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            PHASE_SECONDS.labels(callback, phase).observe(elapsed)
+            _current.phase_seconds += elapsed
+            if rows:
+                _current.rows = (_current.rows or 0) + len(result)
+            if cells:
+                _current.cells = (_current.cells or 0) + len(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def instrument(func):
+    """Decorator recording the phases, filtered rows and cells and response size of a callback."""
+    if not METRICS_ENABLED:
+        return func
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        _current.callback, _current.phase_seconds, _current.rows, _current.cells = name, 0.0, None, None
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            end = time.perf_counter()
+            CALLBACK_SECONDS.labels(name).observe(end - start)
+            # No phase ran on a figure cache hit: nothing was filtered or built
+            if _current.phase_seconds:
+                PHASE_SECONDS.labels(name, 'figure').observe(end - start - _current.phase_seconds)
+            if _current.rows is not None:
+                FILTERED_ROWS.labels(name).observe(_current.rows)
+            if _current.cells is not None:
+                FILTERED_CELLS.labels(name).observe(_current.cells)
+            _current.callback = None
+            if flask.has_request_context():
+                flask.g.metrics_callback = (name, end)
+    return wrapper
+
+
+def install_metrics(server, figure_cache):
+    """Serve /metrics on the Flask server and measure the responses of instrumented callbacks."""
+    if not METRICS_ENABLED:
+        return
+    figure_cache.on_lookup = lambda callback, result: CACHE_LOOKUPS.labels(callback, result).inc()
+
+    @server.after_request
+    def observe_response(response):
+        measured = flask.g.pop('metrics_callback', None)
+        if measured is not None:
+            name, callback_end = measured
+            PHASE_SECONDS.labels(name, 'serialize').observe(time.perf_counter() - callback_end)
+            sent = len(response.get_data())
+            # Set by payloads.install_payloads when it compressed the response
+            RESPONSE_BYTES.labels(name).observe(flask.g.pop('response_bytes', None) or sent)
+            SENT_BYTES.labels(name, response.content_encoding or 'identity').observe(sent)
+        return response
+
+    @server.route(METRICS_PATH)
+    def serve_metrics():
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return flask.Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
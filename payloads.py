@@ -0,0 +1,175 @@
+"""Compact encoding and compression of the figures sent to the browser.
+
+Callbacks decorated with compact_figures() return their figures as plain
+dicts in which:
+
+- numeric arrays are base64 typed arrays, {'dtype': 'f8', 'bdata': ..., 'shape': ...}
+  (integers in the smallest type that holds them, like the integral floats);
+- string (or mixed) arrays with repeated values, such as the hover data of a
+  scatter, are a list of distinct labels plus typed codes into it,
+  {'labels': [...], 'codes': {...}};
+- the default Plotly template is replaced by its name, the template itself
+  being sent once with the page (see install_payloads).
+
+assets/figure_payloads.js decodes them before plotly.js draws the figure.
+The typed arrays use the format plotly.js decodes natively from 2.28 on.
+
+install_payloads() also compresses the JSON responses of Dash (callbacks,
+layout and dependencies) with Flask-Compress. COMPACT_FIGURES=0 sends plain
+figures and DASH_COMPRESS=0 uncompressed responses.
+"""
+import base64
+import functools
+import json
+import os
+
+import flask
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from plotly.basedatatypes import BaseFigure
+from flask_compress import Compress
+from plotly.utils import PlotlyJSONEncoder
+
+from metrics import timed
+
+COMPACT_FIGURES = os.environ.get('COMPACT_FIGURES', '1') == '1'
+COMPRESS_RESPONSES = os.environ.get('DASH_COMPRESS', '1') == '1'
+COMPRESSED_ROUTES = ('_dash-update-component', '_dash-layout', '_dash-dependencies')
+
+# Shorter arrays are left as JSON, the encoding would not save anything
+MIN_ENCODED_LENGTH = 8
+
+# Smallest first, as plotly.js names them
+INTEGER_DTYPES = [('u1', np.uint8), ('i1', np.int8), ('u2', np.uint16), ('i2', np.int16), ('u4', np.uint32), ('i4', np.int32)]
+FLOAT_DTYPES = {np.dtype(np.float32): 'f4', np.dtype(np.float64): 'f8'}
+
+
+def default_template():
+    """Return (name, layout.template) of the template px and go figures get by default."""
+    # Read from the registry rather than a go.Figure, whose first construction costs half a second
+    name = pio.templates.default
+    return name, pio.templates[name].to_plotly_json()
+
+DEFAULT_TEMPLATE = default_template()
+
+
+def typed_array(values):
+    """Encode a numeric array as a base64 typed array, in the smallest type holding it exactly."""
+    dtype = None
+    if values.dtype.kind in 'iu' or (values.dtype.kind == 'f' and np.isfinite(values).all() and (values == np.round(values)).all()):
+        low, high = (values.min(), values.max()) if values.size else (0, 0)
+        for name, candidate in INTEGER_DTYPES:
+            info = np.iinfo(candidate)
+            if info.min <= low and high <= info.max:
+                dtype = name
+                values = values.astype(candidate)
+                break
+    if dtype is None:
+        dtype = FLOAT_DTYPES.get(values.dtype, 'f8')
+    # plotly.js's names are numpy's too; the bytes are read little-endian
+    spec = {'dtype': dtype, 'bdata': base64.b64encode(values.astype('<' + dtype).tobytes()).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ','.join(str(n) for n in values.shape)
+    return spec
+
+
+def labelled_array(values):
+    """Encode an array of strings as its distinct labels and codes into them, or None if that is not smaller."""
+    codes, labels = pd.factorize(values.ravel())
+    if len(labels) * 2 > values.size:
+        return None
+    labels = labels.tolist()
+    if (codes < 0).any():
+        # factorize gives missing values code -1
+        codes = np.where(codes < 0, len(labels), codes)
+        labels.append(None)
+    return {'labels': labels, 'codes': typed_array(codes.reshape(values.shape))}
+
+
+def compact_value(value):
+    """Return the compact encoding of a trace attribute, or the value itself if it has none."""
+    if isinstance(value, dict):
+        return {key: compact_value(item) for key, item in value.items()}
+    if not isinstance(value, np.ndarray) or value.size < MIN_ENCODED_LENGTH:
+        return value
+    if value.dtype.kind in 'iuf':
+        return typed_array(value)
+    if value.dtype.kind in 'OU':
+        return labelled_array(value) or value
+    return value
+
+
+def compact_figure(fig):
+    """Return a figure (go.Figure or figure dict) as a compact figure dict."""
+    figure = fig.to_plotly_json() if isinstance(fig, BaseFigure) else dict(fig)
+    figure['data'] = [compact_value(trace) for trace in figure.get('data', [])]
+    if figure.get('frames'):
+        figure['frames'] = [dict(frame, data=[compact_value(trace) for trace in frame.get('data', [])]) for frame in figure['frames']]
+
+    name, template = DEFAULT_TEMPLATE
+    layout = figure.get('layout') or {}
+    if layout.get('template') == template:
+        figure['layout'] = dict(layout, template=name)
+    return figure
+
+
+def _compact(value):
+    """Compact the figures among value, recursing into tuples and lists (see compact_outputs)."""
+    if isinstance(value, (tuple, list)):
+        return type(value)(_compact(item) for item in value)
+    if isinstance(value, BaseFigure) or (isinstance(value, dict) and 'data' in value):
+        return compact_figure(value)
+    return value
+
+
+@timed('encode')
+def compact_outputs(value):
+    """Compact the figures among a callback's return value (a figure or a tuple of outputs).
+
+    Only this entry point is timed, so a callback records one encode phase
+    however many outputs it returns.
+    """
+    return _compact(value)
+
+
+def compact_figures(func):
+    """Decorator returning func's figures compacted (see compact_figure)."""
+    if not COMPACT_FIGURES:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        return compact_outputs(func(*args))
+    return wrapper
+
+
+def install_payloads(app):
+    """Send the default template with the page and compress Dash's JSON responses.
+
+    Call it after install_metrics: Flask runs the after_request hooks last
+    registered first, so the metrics then see the compressed response, and
+    the uncompressed size in flask.g.response_bytes.
+    """
+    name, template = DEFAULT_TEMPLATE
+    templates = json.dumps({name: template}, cls=PlotlyJSONEncoder).replace('</', '<\\/')
+    app.index_string = app.index_string.replace(
+        '{%css%}', '{%css%}\n        <script>window.figureTemplates = ' + templates + ';</script>', 1
+    )
+
+    if not COMPRESS_RESPONSES:
+        return
+    server = app.server
+    # brotli at this level compresses JSON better than gzip at no more CPU; gzip for older clients
+    server.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    server.config['COMPRESS_BR_LEVEL'] = 4
+    server.config['COMPRESS_REGISTER'] = False
+    compress = Compress(server)
+
+    @server.after_request
+    def compress_response(response):
+        if flask.request.path.endswith(COMPRESSED_ROUTES) and not response.direct_passthrough:
+            flask.g.response_bytes = response.content_length
+            response = compress.after_request(response)
+        return response
+
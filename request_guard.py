@@ -0,0 +1,79 @@
+"""Dropping of callback requests overtaken by newer ones from the same page.
+
+While a slider moves, the browser can send several requests for the same
+callback before the first one is answered, and only the last answer is
+ever shown. Requests of one page for one callback are therefore run one at
+a time, and a request that a newer one overtook while it waited is dropped
+(PreventUpdate) instead of computed.
+
+Pages are told apart by the PAGE_HEADER that assets/page_id.js adds to
+their callback requests, a random id drawn on every page load. A cookie
+would not do: every tab of a browser sends the same one, and a tab whose
+request was dropped for another tab's would keep a stale figure.
+
+Requests are matched within one worker process; with threaded workers (see
+gunicorn.conf.py) the requests of a drag queue up in the same process.
+"""
+import functools
+import itertools
+import threading
+from collections import Counter
+
+import flask
+from dash.exceptions import PreventUpdate
+
+PAGE_HEADER = 'X-Dash-Page'
+
+
+def page_id():
+    """Return the page id of the current request, or None (outside a request or without the header)."""
+    if not flask.has_request_context():
+        return None
+    return flask.request.headers.get(PAGE_HEADER)
+
+
+class RequestGuard:
+    """Runs only the latest pending request of each (page, callback)."""
+
+    def __init__(self):
+        self.dropped = Counter()
+        self._lock = threading.Lock()
+        # Sequence numbers come from one counter, so they never repeat across keys
+        self._sequence = itertools.count(1)
+        self._latest = {}
+        self._running = {}
+
+    def _start(self, key):
+        with self._lock:
+            seq = next(self._sequence)
+            self._latest[key] = seq
+            return seq, self._running.setdefault(key, threading.Lock())
+
+    def _finish(self, key, seq):
+        with self._lock:
+            # Forget the key once its latest request is done; older ones still
+            # waiting on the lock see a missing key and drop themselves
+            if self._latest.get(key) == seq:
+                del self._latest[key]
+                del self._running[key]
+
+    def guard(self, func):
+        """Decorator dropping calls of func superseded by a newer call from the same page."""
+        @functools.wraps(func)
+        def wrapper(*args):
+            page = page_id()
+            if page is None:
+                return func(*args)
+            key = (page, func.__name__)
+            seq, running = self._start(key)
+            with running:
+                with self._lock:
+                    superseded = self._latest.get(key) != seq
+                if superseded:
+                    self.dropped[func.__name__] += 1
+                    raise PreventUpdate
+                try:
+                    return func(*args)
+                finally:
+                    self._finish(key, seq)
+        return wrapper
@@ -0,0 +1,239 @@
+"""Synthetic transfer datasets shaped like the bundled CSV, at any size.
+
+    python synthetic_data.py 5000000 /tmp/transfers-5m    # add --snapshot to also build its snapshot
+    DASH_DATA_DIR=/tmp/transfers-5m python app.py
+
+The generator is fitted to the bundled CSV (fit_profile) and writes a CSV with
+the same columns, which the loader reads like the real one:
+
+- transfer years, positions, feet and nationalities follow their frequencies
+  in the source;
+- the number of transfers per player follows a (truncated) Zipf distribution
+  with the source's mean. Each player has one birth date (their age at the mean
+  of their transfer years is drawn from the source's ages at transfer),
+  position, foot and nationality, and leaves the club they last joined
+  (club_name_from is the previous club_name_to);
+- every club belongs to exactly one league. Leagues are picked with the source's
+  shares, clubs within a league by Zipf rank weights with the exponent fitted
+  on the source. Bigger datasets get more leagues of ~33 clubs, growing with
+  the square root of the size, as a longer history covers more competitions;
+- the same share of fees as in the source is zero, the rest is log-normal
+  with the source's mean and spread, rounded to 10,000 and capped at the
+  source's record fee.
+
+Players and their rows are drawn and written in chunks of about CHUNK_ROWS
+transfers, so memory stays flat whatever the size.
+"""
+import argparse
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import CSV_PATH, SOURCE_COLUMNS, build_snapshot
+
+CHUNK_ROWS = 100_000
+MAX_TRANSFERS_PER_PLAYER = 30
+CLUBS_PER_LEAGUE = 33
+FEE_ROUNDING = 10_000
+
+
+def frequencies(values):
+    """Return (distinct values, their frequencies) of a column, ignoring missing values."""
+    counts = values.dropna().value_counts()
+    return counts.index.to_numpy(), counts.to_numpy() / counts.sum()
+
+
+def zipf_exponent(counts):
+    """Fit s in count ~ rank^-s to the counts of a rank-frequency distribution."""
+    counts = np.sort(np.asarray(counts, dtype=float))[::-1]
+    ranks = np.arange(1, len(counts) + 1)
+    return -np.polyfit(np.log(ranks), np.log(counts), 1)[0]
+
+
+def zipf_weights(n, exponent):
+    """Return the normalised weights rank^-exponent of ranks 1..n."""
+    weights = np.arange(1, n + 1, dtype=float) ** -exponent
+    return weights / weights.sum()
+
+
+def transfers_per_player(mean, max_count=MAX_TRANSFERS_PER_PLAYER):
+    """Return the probabilities of 1..max_count transfers, Zipf-distributed with the given mean."""
+    counts = np.arange(1, max_count + 1)
+    exponents = np.linspace(1.01, 5, 400)
+    pmfs = np.array([zipf_weights(max_count, a) for a in exponents])
+    return pmfs[np.argmin(np.abs(pmfs @ counts - mean))]
+
+
+def fit_profile(source):
+    """Return the distributions of a raw transfers frame (as read from the CSV) the generator draws from."""
+    dates = pd.to_datetime(source['transfer_date'])
+    years = dates.dt.year
+    ages = years - pd.to_datetime(source['date_of_birth']).dt.year
+    fees = source['transfer_fee']
+    positive = np.log(fees[fees > 0])
+
+    league_counts = source['league_name_to'].value_counts()
+    within_league = [zipf_exponent(g.value_counts()) for _, g in source.groupby('league_name_to')['club_name_to'] if g.nunique() > 1]
+
+    return {
+        'rows': len(source),
+        'years': frequencies(years),
+        'ages': frequencies(ages),
+        'positions': frequencies(source['position']),
+        'feet': frequencies(source['foot']),
+        'countries': frequencies(source['country_of_citizenship']),
+        'leagues': (league_counts.index.to_numpy(), league_counts.to_numpy() / league_counts.sum()),
+        'league_exponent': zipf_exponent(league_counts),
+        'club_exponent': float(np.mean(within_league)),
+        # Real clubs of each real league, most frequent first
+        'league_clubs': {
+            league: source.loc[source['league_name_to'] == league, 'club_name_to'].value_counts().index.to_list()
+            for league in league_counts.index
+        },
+        'no_club_share': source['club_name_to'].isna().mean(),
+        'no_from_share': source['club_name_from'].isna().mean(),
+        'zero_fee_share': (fees <= 0).mean(),
+        'log_fee': (positive.mean(), positive.std()),
+        'max_fee': fees.max(),
+        'transfers_per_player': source.groupby('player_name').size().mean(),
+        'last_date': dates.max(),
+    }
+
+
+def build_clubs(profile, rows):
+    """Return (club names, league of each club, league names, league weights, club weight within its league)."""
+    real_leagues, real_shares = profile['leagues']
+    n_leagues = max(len(real_leagues), round(len(real_leagues) * np.sqrt(rows / profile['rows'])))
+
+    # Real shares for the real leagues, continued by the fitted Zipf law for the extra ones
+    extra_ranks = np.arange(len(real_leagues) + 1, n_leagues + 1)
+    extra_shares = real_shares[-1] * (extra_ranks / len(real_leagues)) ** -profile['league_exponent']
+    league_weights = np.concatenate([real_shares, extra_shares])
+    league_names = np.concatenate([real_leagues, [f"synthetic-league-{rank}" for rank in extra_ranks]]).astype(object)
+
+    names, leagues, weights = [], [], []
+    for code, league in enumerate(league_names):
+        clubs = profile['league_clubs'].get(league) or [f"Synthetic Club {code}-{i}" for i in range(1, CLUBS_PER_LEAGUE + 1)]
+        names += clubs
+        leagues += [code] * len(clubs)
+        weights.append(zipf_weights(len(clubs), profile['club_exponent']))
+    return (np.array(names, dtype=object), np.array(leagues), league_names,
+            league_weights / league_weights.sum(), np.concatenate(weights))
+
+
+def player_counts(rng, probabilities, rows, chunk_rows=CHUNK_ROWS):
+    """Yield the numbers of transfers of successive players, in chunks of about chunk_rows transfers totalling rows."""
+    mean = probabilities @ np.arange(1, len(probabilities) + 1)
+    remaining = rows
+    while remaining > 0:
+        # Enough players to cover the chunk; the last one may run past it, but not past rows
+        target = min(chunk_rows, remaining)
+        counts = rng.choice(len(probabilities), size=int(target / mean * 1.5) + 1, p=probabilities) + 1
+        while counts.sum() < target:
+            counts = np.concatenate([counts, rng.choice(len(probabilities), size=len(counts), p=probabilities) + 1])
+        cumulative = np.cumsum(counts)
+        counts = counts[:np.searchsorted(cumulative, target) + 1]
+        counts[-1] -= max(int(counts.sum()) - remaining, 0)
+        remaining -= int(counts.sum())
+        yield counts
+
+
+def generate_chunk(rng, profile, clubs, first_player, counts):
+    """Return the transfers of the players numbered from first_player, with counts transfers each."""
+    club_names, club_leagues, league_names, league_weights, club_weights = clubs
+    n_players, n_rows = len(counts), int(counts.sum())
+    player = np.repeat(np.arange(n_players), counts)
+
+    def pick(distribution, size):
+        values, probabilities = distribution
+        return values[rng.choice(len(values), size=size, p=probabilities)]
+
+    # Per transfer: a year with the source's frequencies and a random day of it
+    year = pick(profile['years'], n_rows).astype(int)
+    date = (year - 1970).astype('datetime64[Y]') + rng.integers(0, 365, n_rows).astype('timedelta64[D]')
+    date = np.minimum(date, np.datetime64(profile['last_date'].date()))
+
+    # Per player: a birth date putting their age at the mean of their transfer years at one of the source's ages
+    mean_year = np.rint(np.bincount(player, weights=year) / counts).astype(int)
+    birth_year = mean_year - pick(profile['ages'], n_players).astype(int)
+    birth = (birth_year - 1970).astype('datetime64[Y]') + rng.integers(0, 365, n_players).astype('timedelta64[D]')
+
+    # Each player's transfers in date order, so the club a player leaves is the one they last joined
+    order = np.lexsort((date, player))
+    player, date = player[order], date[order]
+
+    # Destination: a league by share, then a club of that league by Zipf rank; some rows have none
+    league = rng.choice(len(league_names), size=n_rows, p=league_weights)
+    league_start = np.searchsorted(club_leagues, np.arange(len(league_names)))
+    league_size = np.bincount(club_leagues, minlength=len(league_names))
+    club = np.empty(n_rows, dtype=np.int64)
+    for code in np.unique(league):
+        rows = np.flatnonzero(league == code)
+        weights = club_weights[league_start[code]:league_start[code] + league_size[code]]
+        club[rows] = league_start[code] + rng.choice(league_size[code], size=len(rows), p=weights)
+    club[rng.random(n_rows) < profile['no_club_share']] = -1
+
+    # Origin: the previous destination of the same player, else a random club or none
+    previous = np.concatenate([[-1], club[:-1]])
+    previous[np.concatenate([[True], player[1:] != player[:-1]])] = -1
+    missing = previous < 0
+    random_from = rng.choice(len(club_names), size=n_rows, p=league_weights[club_leagues] * club_weights / (league_weights[club_leagues] * club_weights).sum())
+    no_from_share = min(profile['no_from_share'] / max(missing.mean(), 1e-9), 1.0)
+    random_from[rng.random(n_rows) < no_from_share] = -1
+    club_from = np.where(missing, random_from, previous)
+
+    # Fees: the source's share of zeros, log-normal otherwise
+    mean, spread = profile['log_fee']
+    fee = np.maximum(np.round(np.exp(rng.normal(mean, spread, n_rows)) / FEE_ROUNDING), 1) * FEE_ROUNDING
+    fee = np.minimum(fee, profile['max_fee'])
+    fee[rng.random(n_rows) < profile['zero_fee_share']] = 0.0
+
+    def labels(names, codes):
+        return np.where(codes >= 0, names[np.maximum(codes, 0)], None)
+
+    return pd.DataFrame({
+        'transfer_date': date.astype(str),
+        'club_name_from': labels(club_names, club_from),
+        'club_name_to': labels(club_names, club),
+        'league_name_to': labels(league_names, np.where(club >= 0, club_leagues[np.maximum(club, 0)], -1)),
+        'transfer_fee': fee,
+        'player_name': np.char.add('Player ', (first_player + player).astype(str)),
+        'country_of_citizenship': pick(profile['countries'], n_players)[player],
+        'date_of_birth': birth.astype(str)[player],
+        'position': pick(profile['positions'], n_players)[player],
+        'foot': pick(profile['feet'], n_players)[player],
+    }, columns=SOURCE_COLUMNS)
+
+
+def generate_dataset(rows, data_dir, seed=0, source_path=CSV_PATH, snapshot=False):
+    """Write a synthetic dataset of about `rows` transfers to data_dir and return the CSV path."""
+    source = pd.read_csv(source_path, compression='gzip')
+    profile = fit_profile(source)
+    rng = np.random.default_rng(seed)
+    clubs = build_clubs(profile, rows)
+
+    os.makedirs(data_dir, exist_ok=True)
+    csv_path = os.path.join(data_dir, os.path.basename(CSV_PATH))
+    tmp_path = csv_path + '.tmp'
+    first_player = 0
+    with gzip.open(tmp_path, 'wt', compresslevel=1, newline='') as f:
+        for i, counts in enumerate(player_counts(rng, transfers_per_player(profile['transfers_per_player']), rows)):
+            generate_chunk(rng, profile, clubs, first_player, counts).to_csv(f, header=(i == 0), index=False)
+            first_player += len(counts)
+    os.replace(tmp_path, csv_path)
+
+    if snapshot:
+        build_snapshot(csv_path, os.path.join(data_dir, 'master_snapshot.npz'))
+    return csv_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic transfers dataset shaped like the bundled CSV.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('data_dir')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--snapshot', action='store_true', help="also build the snapshot the app loads")
+    options = parser.parse_args()
+    print(f"Wrote {generate_dataset(options.rows, options.data_dir, options.seed, snapshot=options.snapshot)}")
@@ -0,0 +1,45 @@
+"""Small random transfer datasets shaped like the bundled CSV, for the tests."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_store import SOURCE_COLUMNS, prepare_master_df  # noqa: E402
+
+LEAGUES = ['premier-league', 'laliga', 'serie-a', 'bundesliga', None]
+CLUBS = {'premier-league': ['Arsenal', 'Chelsea'], 'laliga': ['Getafe', 'Sevilla'],
+         'serie-a': ['Inter', 'Lazio'], 'bundesliga': ['Mainz', 'Bochum'], None: [None]}
+POSITIONS = ['Attack', 'Midfield', 'Defender', 'Goalkeeper']
+FEET = ['left', 'right', 'both', None]
+
+
+def raw_transfers(rows, seed=0, first_year=2000, last_year=2020):
+    """Return a raw transfers frame (as read from the CSV) with missing leagues, feet and birth dates and free transfers."""
+    rng = np.random.default_rng(seed)
+    year = rng.integers(first_year, last_year + 1, rows)
+    leagues = rng.choice(len(LEAGUES), rows)
+    birth = pd.to_datetime(pd.Series(year - rng.integers(17, 36, rows)).astype(str) + '-03-01')
+    birth[rng.random(rows) < 0.05] = pd.NaT
+    fee = np.round(np.exp(rng.normal(14, 2, rows)), -4)
+    fee[rng.random(rows) < 0.5] = 0.0
+    return pd.DataFrame({
+        'transfer_date': pd.to_datetime(pd.Series(year).astype(str) + '-07-01'),
+        'club_name_from': rng.choice(['Mainz', 'Getafe', None], rows),
+        'club_name_to': [CLUBS[LEAGUES[l]][i % 2 if LEAGUES[l] else 0] for i, l in enumerate(leagues)],
+        'league_name_to': [LEAGUES[l] for l in leagues],
+        'transfer_fee': fee,
+        'player_name': [f"Player {i}" for i in rng.integers(0, rows // 3 + 1, rows)],
+        'country_of_citizenship': rng.choice(['France', 'Spain', 'England'], rows),
+        'date_of_birth': birth,
+        'position': rng.choice(POSITIONS, rows),
+        'foot': rng.choice(FEET, rows),
+    }, columns=SOURCE_COLUMNS)
+
+
+@pytest.fixture
+def master_df():
+    return prepare_master_df(raw_transfers(5000))
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from aggregates import CLUB_CUBE_DIMENSIONS, FeeCube
+from conftest import raw_transfers
+from data_store import append_rows, prepare_master_df
+
+
+def pandas_aggregate(rows, by, how='sum'):
+    """What FeeCube.aggregate should return, computed from the raw rows."""
+    grouped = rows.groupby(by, observed=True)['transfer_fee'].agg(how).reset_index()
+    # observed=True groups come out in order of appearance on some pandas versions
+    grouped = grouped.sort_values(by, ignore_index=True)
+    return grouped.astype({dim: object for dim in by if dim != 'transfer_year'})
+
+
+def cube_aggregate(cube, cells, by, how='sum'):
+    result = cube.aggregate(cells, by, how)
+    return result.astype({dim: object for dim in by if dim != 'transfer_year'})
+
+
+@pytest.mark.parametrize('how', ['sum', 'max'])
+def test_fee_cube_matches_pandas(master_df, how):
+    cube = FeeCube(master_df)
+    cells = cube.select(years=(2005, 2015), ages=(20, 28), position=['Attack', 'Midfield'], foot=['left', 'both'])
+    rows = master_df[
+        master_df['transfer_year'].between(2005, 2015) & master_df['player_age'].between(20, 28)
+        & master_df['position'].isin(['Attack', 'Midfield']) & master_df['foot'].isin(['left', 'both'])
+    ]
+    by = ['transfer_year', 'league_name_to']
+    assert_frame_equal(cube_aggregate(cube, cells, by, how), pandas_aggregate(rows, by, how), check_dtype=False)
+
+
+def test_fee_cube_paid_only_matches_pandas(master_df):
+    cube = FeeCube(master_df)
+    cells = cube.select(ages=(18, 40), paid_only=True, position=['Defender'])
+    rows = master_df[master_df['player_age'].between(18, 40) & (master_df['position'] == 'Defender') & (master_df['transfer_fee'] > 0)]
+    assert_frame_equal(
+        cube_aggregate(cube, cells, ['league_name_to']), pandas_aggregate(rows, ['league_name_to']), check_dtype=False)
+
+
+def test_club_cube_matches_pandas(master_df):
+    cube = FeeCube(master_df, CLUB_CUBE_DIMENSIONS)
+    cells = cube.select(years=(2010, 2020), league_name_to=['Laliga', 'Serie A'], club_name_to=['Getafe', 'Inter'])
+    rows = master_df[
+        master_df['transfer_year'].between(2010, 2020) & master_df['league_name_to'].isin(['Laliga', 'Serie A'])
+        & master_df['club_name_to'].isin(['Getafe', 'Inter'])
+    ]
+    by = ['transfer_year', 'club_name_to']
+    assert_frame_equal(cube_aggregate(cube, cells, by), pandas_aggregate(rows, by), check_dtype=False)
+
+
+def test_appended_cube_matches_fresh_build(master_df):
+    delta = prepare_master_df(raw_transfers(500, seed=1, first_year=2015, last_year=2025))
+    appended = FeeCube(master_df).appended(delta)
+    fresh = FeeCube(append_rows(master_df, delta))
+    by = ['transfer_year', 'league_name_to', 'position']
+    assert_frame_equal(appended.aggregate(appended.select(ages=(0, 99)), by), fresh.aggregate(fresh.select(ages=(0, 99)), by))
+    assert pd.Series(appended.labels['transfer_year']).equals(pd.Series(fresh.labels['transfer_year']))
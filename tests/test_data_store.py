@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+import data_store
+from conftest import raw_transfers
+from data_store import (
+    append_delta, append_rows, build_shared_dataset, build_snapshot, load_master, read_delta, read_master_csv,
+    segment_paths, snapshot_deltas,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Paths of a CSV with its snapshot and shared file, as built by `python data_store.py --shared`."""
+    paths = {
+        'csv_path': str(tmp_path / 'master.csv.gz'),
+        'snapshot_path': str(tmp_path / 'master_snapshot.npz'),
+        'shared_path': str(tmp_path / 'master_shared.bin'),
+    }
+    raw_transfers(3000).to_csv(paths['csv_path'], index=False, compression='gzip')
+    build_snapshot(paths['csv_path'], paths['snapshot_path'])
+    build_shared_dataset(paths['shared_path'], paths['csv_path'], paths['snapshot_path'])
+    return paths
+
+
+def write_deltas(directory, count):
+    """Write delta files, some with new clubs and years, and return them prepared."""
+    deltas = []
+    for i in range(count):
+        raw = raw_transfers(200, seed=i + 1, first_year=2010, last_year=2020 + i)
+        raw.loc[:10, 'club_name_to'] = f"New Club {i}"
+        path = os.path.join(directory, f"delta{i}.csv")
+        raw.to_csv(path, index=False)
+        deltas.append(read_delta(path))
+    return deltas
+
+
+@pytest.mark.parametrize('compact_fraction', [0.1, 10.0])
+def test_append_delta_matches_fresh_build(store, tmp_path, monkeypatch, compact_fraction):
+    monkeypatch.setattr(data_store, 'SEGMENT_COMPACT_FRACTION', compact_fraction)
+    deltas = write_deltas(str(tmp_path), 4)
+    for i, delta in enumerate(deltas):
+        append_delta(delta, {'name': f"delta{i}.csv", 'hash': str(i), 'rows': len(delta)}, **store)
+
+    expected = read_master_csv(store['csv_path'])
+    for delta in deltas:
+        expected = append_rows(expected, delta)
+    df, applied, _ = load_master(store['csv_path'], store['snapshot_path'], shared=False)
+    assert_frame_equal(df, expected)
+    assert [d['name'] for d in applied] == [f"delta{i}.csv" for i in range(4)]
+    assert snapshot_deltas(store['csv_path'], store['snapshot_path']) == applied
+    # Compacting folds the segments into the snapshot, otherwise each delta keeps its own
+    assert len(segment_paths(store['snapshot_path'])) == (4 if compact_fraction > 1 else 0)
+
+    # The shared file merged in place is the one a full rebuild writes
+    fresh_path = str(tmp_path / 'fresh.bin')
+    build_shared_dataset(fresh_path, store['csv_path'], store['snapshot_path'])
+    with open(store['shared_path'], 'rb') as merged, open(fresh_path, 'rb') as fresh:
+        assert merged.read() == fresh.read()
+
+
+def test_rebuilt_snapshot_drops_deltas(store, tmp_path):
+    delta, = write_deltas(str(tmp_path), 1)
+    append_delta(delta, {'name': 'delta0.csv', 'hash': '0', 'rows': len(delta)}, **store)
+    build_snapshot(store['csv_path'], store['snapshot_path'])
+    df, applied, _ = load_master(store['csv_path'], store['snapshot_path'], shared=False)
+    assert applied == [] and len(df) == 3000
@@ -0,0 +1,55 @@
+import io
+
+import flask
+import pandas as pd
+import pytest
+
+import export
+from aggregates import FeeCube, YearIndex
+from export import install_export
+
+
+@pytest.fixture
+def client(master_df, monkeypatch):
+    # Small chunks, so filters are applied across several of them
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_ROWS', 700)
+    year_index = YearIndex(master_df['transfer_year'].values)
+    server = flask.Flask(__name__)
+    install_export(server, lambda year_range: master_df.iloc[year_index.slice(year_range)])
+    return server.test_client()
+
+
+def exported(client, query):
+    response = client.get('/export.csv?' + query)
+    assert response.status_code == 200
+    return pd.read_csv(io.BytesIO(response.data))
+
+
+def test_export_applies_every_filter(client, master_df):
+    rows = exported(client, 'years=2005-2012&ages=20-27&leagues=Laliga&leagues=Serie A&positions=Midfield&feet=left&feet=both')
+    expected = master_df[
+        master_df['transfer_year'].between(2005, 2012) & master_df['player_age'].between(20, 27)
+        & master_df['league_name_to'].isin(['Laliga', 'Serie A']) & (master_df['position'] == 'Midfield')
+        & master_df['foot'].isin(['left', 'both'])
+    ]
+    assert len(rows) == len(expected) > 0
+    assert rows['transfer_fee'].sum() == pytest.approx(expected['transfer_fee'].sum())
+    assert set(rows['position']) == {'Midfield'}
+
+
+def test_export_rows_are_the_rows_behind_the_charts(client, master_df):
+    # The same filter values select the same fees in the export and in the fee cube of the charts
+    rows = exported(client, 'ages=18-30&positions=Attack&positions=Midfield&feet=right')
+    cube = FeeCube(master_df)
+    cells = cube.select(ages=(18, 30), position=['Attack', 'Midfield'], foot=['right'])
+    assert rows['transfer_fee'].sum() == pytest.approx(cells['fee_sum'].sum())
+    assert len(rows) == cells['fee_count'].sum()
+
+
+def test_export_without_filters_has_every_row(client, master_df):
+    assert len(exported(client, '')) == len(master_df)
+
+
+def test_export_rejects_bad_ranges(client):
+    assert client.get('/export.csv?years=2014').status_code == 400
+    assert client.get('/export.xlsx').status_code == 404
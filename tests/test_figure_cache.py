@@ -0,0 +1,44 @@
+from figure_cache import DiskFigureStore, FigureCache
+
+
+def counting_callback(cache, calls):
+    @cache.memoize
+    def update_chart(year_range, leagues):
+        calls.append((tuple(year_range), tuple(leagues)))
+        return {'data': [{'x': list(range(*year_range))}], 'layout': {'title': {'text': ','.join(leagues)}}}
+    return update_chart
+
+
+def test_equivalent_inputs_share_an_entry():
+    calls = []
+    update_chart = counting_callback(FigureCache(version='v1'), calls)
+    first = update_chart([2014, 2018], ['Laliga', 'Serie A'])
+    assert update_chart([2014, 2018], ['Serie A', 'Laliga', 'Laliga']) is first
+    assert len(calls) == 1
+
+
+def test_new_version_invalidates_local_entries():
+    calls = []
+    cache = FigureCache(version='v1')
+    update_chart = counting_callback(cache, calls)
+    update_chart([2014, 2018], ['Laliga'])
+    cache.set_version('v2')
+    update_chart([2014, 2018], ['Laliga'])
+    assert len(calls) == 2
+    assert cache.info()['misses'] == {'update_chart': 2}
+
+
+def test_shared_store_is_keyed_on_version(tmp_path):
+    calls = []
+    update_chart = counting_callback(FigureCache(version='v1', shared=DiskFigureStore(str(tmp_path))), calls)
+    figure = update_chart([2014, 2018], ['Laliga'])
+
+    # Another worker on the same version gets the figure from the store, one on another version does not
+    same = FigureCache(version='v1', shared=DiskFigureStore(str(tmp_path)))
+    assert counting_callback(same, calls)([2014, 2018], ['Laliga']) == figure
+    assert same.info()['shared_hits'] == {'update_chart': 1}
+
+    other = FigureCache(version='v2', shared=DiskFigureStore(str(tmp_path)))
+    counting_callback(other, calls)([2014, 2018], ['Laliga'])
+    assert other.info()['misses'] == {'update_chart': 1}
+    assert len(calls) == 2
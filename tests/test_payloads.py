@@ -0,0 +1,52 @@
+import base64
+import json
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+from payloads import DEFAULT_TEMPLATE, compact_figure
+
+
+def decode(value):
+    """Undo compact_value, as assets/figure_payloads.js does in the browser."""
+    if isinstance(value, dict) and 'bdata' in value:
+        array = np.frombuffer(base64.b64decode(value['bdata']), dtype='<' + value['dtype'])
+        return array.reshape([int(n) for n in value['shape'].split(',')]) if 'shape' in value else array
+    if isinstance(value, dict) and 'labels' in value:
+        return np.array(value['labels'], dtype=object)[decode(value['codes'])]
+    if isinstance(value, dict):
+        return {key: decode(item) for key, item in value.items()}
+    return value
+
+
+def plain(value):
+    """Return a figure as the JSON-ready data plotly.js gets without compact payloads."""
+    return json.loads(json.dumps(value, cls=PlotlyJSONEncoder))
+
+
+def test_compact_figure_round_trip():
+    rng = np.random.default_rng(0)
+    fees = np.round(rng.lognormal(14, 2, 200), -4)
+    fees[:50] = 0.0
+    fig = px.scatter(
+        x=rng.integers(17, 36, 200).astype(float), y=fees / 1e6, color=rng.integers(2000, 2021, 200),
+        custom_data=[rng.choice(['Arsenal', 'Getafe', 'Inter'], 200), np.where(fees > 0, 'paid', None)],
+    )
+    counts = rng.integers(0, 3000, (12, 20)).astype(float)
+    fig.add_trace(go.Heatmap(z=np.where(counts > 0, np.log10(np.maximum(counts, 1)), np.nan), y=np.geomspace(0.01, 200, 13)))
+
+    compact = compact_figure(fig)
+    assert compact['layout']['template'] == DEFAULT_TEMPLATE[0]
+    assert 'bdata' in compact['data'][0]['x'] and 'labels' in compact['data'][0]['customdata']
+
+    decoded = plain({'data': [decode(trace) for trace in compact['data']]})
+    assert decoded == plain({'data': fig.to_plotly_json()['data']})
+
+
+def test_integral_floats_use_small_integer_types():
+    encoded = compact_figure(go.Figure(go.Bar(x=np.arange(2000, 2024, dtype=float), y=np.arange(24) * 1e6)))
+    assert encoded['data'][0]['x']['dtype'] == 'u2'
+    assert encoded['data'][0]['y']['dtype'] == 'u4'
+    np.testing.assert_array_equal(decode(encoded['data'][0]['y']), np.arange(24) * 1e6)